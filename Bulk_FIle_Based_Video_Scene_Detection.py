@@ -1,105 +1,127 @@
 import cv2
 import os
-import numpy as np
-import speech_recognition as sr
-from moviepy.editor import *
+import threading
 import tkinter as tk
 from tkinter import filedialog
+from scene_detection import iter_video_scene_changes, run_detection_pipeline, print_pipeline_stats
+from scene_output import StoryboardWriter
+from scene_cache import SceneCache
+from media_reader import MediaReader
+from transcript_cache import TranscriptCache
+from transcription import extract_pcm, transcribe_pcm, speech_regions, describe_speech_regions, get_backend, BatchRecognizer, segments_text, segments_timestamped
+from concurrent.futures import ThreadPoolExecutor
 
 def create_directory(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-def stitch_images(images, rows, cols):
-    images = [img for img in images if img is not None and img.size > 0]
-    if not images:
-        return None
-    max_height = max(image.shape[0] for image in images)
-    max_width = max(image.shape[1] for image in images)
-    stitched_image = np.zeros((max_height * rows, max_width * cols, 3), dtype=np.uint8)
-    for i, img in enumerate(images):
-        if i >= rows * cols:
-            break
-        row = i // cols
-        col = i % cols
-        resized_image = cv2.resize(img, (max_width, max_height))
-        stitched_image[row * max_height: (row + 1) * max_height, col * max_width: (col + 1) * max_width, :] = resized_image
-    return stitched_image
-
 def save_frame(frame, scene_index, base_path):
     scene_folder = os.path.join(base_path, "detected_scenes")
     create_directory(scene_folder)
     cv2.imwrite(os.path.join(scene_folder, f"scene_{scene_index}.jpg"), frame)
     print(f"Saved scene {scene_index} in {scene_folder}")
 
-def transcribe_audio(video_path, base_path):
+def transcribe_audio(video_path, base_path, language="id-ID", recognizer=None, max_workers=4, cache=None, vad=True, pcm=None):
     create_directory(base_path)
-    audio = AudioFileClip(video_path)
-    audio_file_path = os.path.join(base_path, "temp_audio.wav")
-    audio.write_audiofile(audio_file_path)
-    recognizer = sr.Recognizer()
-    transcription = ""
-    with sr.AudioFile(audio_file_path) as source:
-        audio_data = recognizer.record(source)
-        try:
-            transcription = recognizer.recognize_google(audio_data, language="id-ID")
-        except sr.UnknownValueError:
-            transcription = "Unable to understand audio"
-        except sr.RequestError as e:
-            transcription = f"Error: {e}"
+    if pcm is None:
+        pcm = extract_pcm(video_path, 16000)
+    recognizer = recognizer or get_backend("google", language=language)
+    regions = None
+    if vad:
+        # Leave out silence, intro music and B-roll before anything reaches the recognizer
+        regions = speech_regions(pcm, 16000)
+        print(describe_speech_regions(regions, 16000, len(pcm)))
+    # Split at pauses and transcribe the pieces in parallel instead of sending the whole file at once
+    # Segments heard before, in this video or another, come from the cache instead of the recognizer
+    segments = []
+    try:
+        segments = transcribe_pcm(pcm, 16000, recognizer, max_workers, cache=cache, regions=regions)
+        transcription = segments_text(segments) or "Unable to understand audio"
+    except RuntimeError as e:
+        # Every segment failed, e.g. the recognizer could not be reached
+        transcription = f"Error: {e}"
+    if cache is not None:
+        print(cache.summary())
     transcription_file_path = os.path.join(base_path, "transcription.txt")
     with open(transcription_file_path, "w") as file:
         file.write(transcription)
+    with open(os.path.join(base_path, "transcription_segments.txt"), "w") as file:
+        file.write(segments_timestamped(segments))
     print(f"Transcription saved to '{transcription_file_path}'")
 
-def detect_cuts_and_create_storyboard(video_path, change_threshold=750000, frame_check_interval=30):
-    cap = cv2.VideoCapture(video_path)
-    prev_frame = None
-    scene_images = []
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if cap.get(cv2.CAP_PROP_POS_FRAMES) % frame_check_interval == 0:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            if prev_frame is not None:
-                diff = cv2.absdiff(prev_frame, gray)
-                non_zero_count = cv2.countNonZero(diff)
-                if non_zero_count > change_threshold:
-                    scene_images.append(frame)
-            prev_frame = gray
-    cap.release()
-    return scene_images
+def detect_cuts_and_create_storyboard(video_path, change_threshold=0.36, frame_check_interval=30, sample_interval=None, metric="changed_pixels", workers=1,
+                                      keyframes_only=False, refine=False, cache=None, samples_path=None, target_scenes_per_minute=None, transition_window=0,
+                                      auto_region=False, roi=None, decode_options=None, open_source=None):
+    # change_threshold="auto" calibrates per video; transition_window > 0 also reports fades and dissolves;
+    # decode_options, e.g. {"backend": "pyav", "threads": 4, "pixel_format": "gray", "output_width": 64}, or open_source picks the analysis decoder
+    yield from iter_video_scene_changes(video_path, change_threshold=change_threshold, metric=metric, sample_interval=sample_interval,
+                                        frame_check_interval=frame_check_interval, workers=workers, keyframes_only=keyframes_only, refine=refine,
+                                        cache=cache, samples_path=samples_path, target_scenes_per_minute=target_scenes_per_minute,
+                                        transition_window=transition_window, auto_region=auto_region, roi=roi, decode_options=decode_options,
+                                        open_source=open_source)
 
-def process_video(video_path):
+def process_video(video_path, pipelined=False, reuse_samples=False, recognizer=None, transcribers=None):
     print(f"Processing video: {video_path}")
     base_path = os.path.splitext(os.path.basename(video_path))[0]
     create_directory(base_path)
-    scene_images = detect_cuts_and_create_storyboard(video_path)
+    rows, cols = 5, 4  # Adjust grid size as needed
+    storyboard = StoryboardWriter(base_path, rows, cols)
 
-    # Save each detected scene, similar to the original code's behavior
-    for index, scene in enumerate(scene_images):
-        save_frame(scene, index, base_path)
+    # Save each detected scene as soon as it is found; the storyboard keeps one page of thumbnails
+    def save_scene(index, event):
+        save_frame(event.frame, index, base_path)
+        storyboard.add(event.frame)
 
-    if scene_images:
-        rows, cols = 5, 4  # Adjust grid size as needed
-        storyboard = stitch_images(scene_images, rows, cols)
-        if storyboard is not None:
-            storyboard_path = os.path.join(base_path, "storyboard.jpg")
-            cv2.imwrite(storyboard_path, storyboard)
-            print(f"Storyboard saved to '{storyboard_path}'")
+    try:
+        # One demux pass feeds frames to scene detection and 16 kHz PCM to transcription
+        reader = MediaReader(video_path)
+    except ImportError as e:
+        print(f"{e}. Reading video and audio separately.")
+        reader = None
+    if reader is not None and (pipelined or reuse_samples):
+        # The detector decodes on its own; demux only the audio, alongside it
+        reader.close_video()
+    try:
+        if pipelined:
+            # Decode, analyze and write JPEGs on separate threads; the reader only supplies the audio
+            print_pipeline_stats(run_detection_pipeline(video_path, save_scene))
         else:
-            print("No valid scenes detected for storyboard.")
-    else:
+            samples_path = os.path.join(base_path, "frame_samples.npy") if reuse_samples else None
+            scene_changes = detect_cuts_and_create_storyboard(video_path, cache=SceneCache(), samples_path=samples_path,
+                                                              open_source=reader.open_video if reader is not None else None)
+            for index, event in enumerate(scene_changes):
+                save_scene(index, event)
+        pcm = reader.read_audio() if reader is not None else None
+    finally:
+        if reader is not None:
+            reader.close()
+
+    if not storyboard.close():
         print("No scenes detected.")
-    transcribe_audio(video_path, base_path)
+    if transcribers is not None:
+        # Transcribe in the background while the next video is scanned
+        return transcribers.submit(transcribe_audio, video_path, base_path, recognizer=recognizer, cache=TranscriptCache(), pcm=pcm)
+    transcribe_audio(video_path, base_path, recognizer=recognizer, cache=TranscriptCache(), pcm=pcm)
 
-def main():
+def main(backend="google", language="id-ID", transcription_workers=2):
     root = tk.Tk()
     root.withdraw()
     video_paths = filedialog.askopenfilenames()  # Allows selection of multiple files
-    for video_path in video_paths:
-        process_video(video_path)
+    # One recognizer for the whole run; segments of videos transcribed at the same time share its batches
+    recognizer = BatchRecognizer(get_backend(backend, language=language))
+    # Each queued job holds its video's decoded audio (about 115 MB per hour), so scanning waits once
+    # every worker is busy and one more job is ready for the next free worker
+    pending = threading.BoundedSemaphore(transcription_workers + 1)
+    with ThreadPoolExecutor(max_workers=transcription_workers, thread_name_prefix="transcription") as transcribers:
+        jobs = []
+        for video_path in video_paths:
+            pending.acquire()
+            job = process_video(video_path, recognizer=recognizer, transcribers=transcribers)
+            job.add_done_callback(lambda f: pending.release())
+            jobs.append(job)
+        for job in jobs:
+            job.result()
+    recognizer.close()
 
 if __name__ == "__main__":
     main()
@@ -1,39 +1,29 @@
 import cv2
 import os
-import numpy as np
-from moviepy.editor import AudioFileClip
 from pytube import Playlist, YouTube
 from pytube.exceptions import AgeRestrictedError
-import speech_recognition as sr
-import time
+from scene_detection import iter_video_scene_changes, attach_frames_from, run_detection_pipeline, print_pipeline_stats, get_video_fps, frames_to_seconds
+from scene_output import SceneWriter, StoryboardWriter
+from scene_cache import SceneCache
+from transcript_cache import TranscriptCache
+from frame_hash_index import FrameHashIndex
+from media_reader import MediaReader
+from transcription import extract_pcm, transcribe_pcm, speech_regions, describe_speech_regions, get_backend, segments_text, segments_timestamped
+from video_fingerprint_index import VideoFingerprintIndex, temporal_fingerprint, video_duration
 
 def create_directory(path):
     """Create a directory if it does not exist."""
     if not os.path.exists(path):
         os.makedirs(path)
 
-def stitch_images(images, rows, cols):
-    """Stitch multiple images into a single image in a grid layout."""
-    if not images:
-        print("No images to stitch.")
-        return None
-    max_height = max(image.shape[0] for image in images)
-    max_width = max(image.shape[1] for image in images)
-    stitched_image = np.zeros((max_height * rows, max_width * cols, 3), dtype=np.uint8)
-    for i, img in enumerate(images):
-        if i >= rows * cols:
-            break
-        row = i // cols
-        col = i % cols
-        img = cv2.resize(img, (max_width, max_height))
-        stitched_image[row * max_height: (row + 1) * max_height, col * max_width: (col + 1) * max_width, :] = img
-    return stitched_image
-
-def detect_cuts_and_create_storyboard(video_path, output_base_path, change_threshold=375000, frame_check_interval=30):
+def detect_cuts_and_create_storyboard(video_path, output_base_path, change_threshold=0.18, frame_check_interval=30, sample_interval=None, metric="changed_pixels", workers=1, pipelined=False, keyframes_only=False, refine=False, jpeg_quality=90, encoder_workers=4, cache=None, hash_index=None, frame_source=None, open_source=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Failed to open video: {video_path}")
         return
+    if sample_interval is None:
+        sample_interval = frames_to_seconds(frame_check_interval, get_video_fps(cap))
+    cap.release()
 
     video_base_name = os.path.splitext(os.path.basename(video_path))[0]
     scene_folder = os.path.join(output_base_path, video_base_name, "scenes")
@@ -41,70 +31,62 @@ def detect_cuts_and_create_storyboard(video_path, output_base_path, change_thres
     create_directory(scene_folder)
     create_directory(storyboard_folder)
 
-    prev_frame = None
-    scene_images = []
-    scene_index = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) % frame_check_interval == 0:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            if prev_frame is not None:
-                diff = cv2.absdiff(prev_frame, gray)
-                non_zero_count = np.count_nonzero(diff)
-                if non_zero_count > change_threshold:
-                    scene_img_path = save_frame(frame, scene_index, scene_folder)
-                    if scene_img_path:
-                        scene_images.append(cv2.imread(scene_img_path))  # Read the saved image for storyboard
-                        scene_index += 1
-            prev_frame = gray
-    cap.release()
+    # Scenes are encoded on a thread pool and added to the storyboard pages as thumbnails, without re-reading the JPEGs
+    storyboard = StoryboardWriter(storyboard_folder, 5, 4, quality=jpeg_quality)  # Adjust rows and cols as needed
+    # Intros, outros and title cards already saved for another video are hardlinked instead of encoded again
+    scene_writer = SceneWriter(scene_folder, quality=jpeg_quality, workers=encoder_workers, storyboard=storyboard, hash_index=hash_index)
 
-    if scene_images:
-        storyboard_image = stitch_images(scene_images, 5, 4)  # Adjust rows and cols as needed
-        if storyboard_image is not None:
-            storyboard_path = os.path.join(storyboard_folder, "storyboard.jpg")
-            if cv2.imwrite(storyboard_path, storyboard_image):
-                print(f"Storyboard saved to '{storyboard_path}'")
-            else:
-                print("Failed to save storyboard image.")
-        else:
-            print("No valid scenes detected for storyboard.")
+    def save_scene(index, event):
+        scene_writer.submit(event.frame, index)
+
+    if pipelined and frame_source is None:
+        # Decode, analyze and write JPEGs on separate threads
+        stats = run_detection_pipeline(video_path, save_scene, change_threshold, metric, sample_interval)
+        print_pipeline_stats(stats)
     else:
+        scene_changes = iter_video_scene_changes(video_path, change_threshold=change_threshold, metric=metric, sample_interval=sample_interval,
+                                                 workers=workers, keyframes_only=keyframes_only, refine=refine, cache=cache, open_source=open_source)
+        if frame_source is not None:
+            # Cuts were found on a small rendition; save the scenes from the HD file or stream instead
+            scene_changes = attach_frames_from(frame_source, scene_changes)
+        for index, event in enumerate(scene_changes):
+            save_scene(index, event)
+    scene_writer.close()
+    if not storyboard.page_paths:
         print("No scenes detected for storyboard creation.")
 
-def save_frame(frame, scene_index, scene_folder):
-    """Save a frame to a specified folder."""
-    filename = f"scene_{scene_index}.jpg"
-    filepath = os.path.join(scene_folder, filename)
-    success = cv2.imwrite(filepath, frame)
-    if success:
-        print(f"Saved scene {scene_index} in {scene_folder}")
-        return filepath
-    else:
-        print(f"Failed to save scene {scene_index} at {filepath}")
-        return None
-    
-def transcribe_audio(video_path, transcription_path, language="en-US", timeout=10):
-    """Transcribe audio from a video file."""
-    audio = AudioFileClip(video_path)
-    audio_file_path = os.path.join(transcription_path, "temp_audio.wav")
-    audio.write_audiofile(audio_file_path, verbose=False, logger=None)
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_file_path) as source:
-        audio_data = recognizer.record(source)
-        try:
-            transcription = recognizer.recognize_google(audio_data, language=language, timeout=timeout)
-        except sr.UnknownValueError:
-            transcription = "Unable to understand audio"
-        except sr.RequestError as e:
-            transcription = f"API request error: {e}"
-        except Exception as e:
-            transcription = f"An error occurred: {e}"
+def transcribe_audio(video_path, transcription_path, language="en-US", timeout=10, pcm=None, sample_rate=16000, max_workers=4, recognizer=None, cache=None, vad=True):
+    """Transcribe audio from a video file, or from 16-bit mono PCM already decoded from it.
+
+    The audio is split at pauses into segments of at most 30 seconds, which are sent to the recognizer
+    max_workers at a time, so long videos neither time out as one request nor run serially.
+    recognizer is a transcription backend; by default the Google Web Speech API in language.
+    With a TranscriptCache, segments whose audio was transcribed before by the same backend and
+    language, in any video, are taken from the cache instead. With vad, only the stretches that
+    speech_regions finds speech in are transcribed; silence, music and noise are skipped. Segments
+    that fail are marked in the transcript, and if all of them fail the error is written instead.
+    """
+    if pcm is None:
+        pcm = extract_pcm(video_path, sample_rate)
+    recognizer = recognizer or get_backend("google", language=language, timeout=timeout)
+    regions = None
+    if vad:
+        regions = speech_regions(pcm, sample_rate)
+        print(describe_speech_regions(regions, sample_rate, len(pcm)))
+    segments = []
+    try:
+        segments = transcribe_pcm(pcm, sample_rate, recognizer, max_workers, cache=cache, regions=regions)
+        transcription = segments_text(segments) or "Unable to understand audio"
+    except RuntimeError as e:
+        # Every segment failed, e.g. the recognizer could not be reached
+        transcription = f"Error: {e}"
+    if cache is not None:
+        print(cache.summary())
     transcription_file_path = os.path.join(transcription_path, "transcription.txt")
     with open(transcription_file_path, "w") as file:
         file.write(transcription)
+    with open(os.path.join(transcription_path, "transcription_segments.txt"), "w") as file:
+        file.write(segments_timestamped(segments))
     print(f"Transcription saved to '{transcription_file_path}'")
 
 def fetch_metadata(youtube_video):
@@ -127,48 +109,115 @@ def save_metadata(metadata, path):
             f.write(f"{key}: {value}\n")
     print(f"Metadata saved to '{metadata_path}'")
 
-def download_and_process_video(yt, download_path, output_base_path):
-    """Download a video and then process it."""
+def download_analysis_rendition(yt, download_path):
+    """Download the smallest progressive stream, which is enough for fingerprinting, scene detection and transcription."""
+    stream = yt.streams.get_lowest_resolution()
+    if stream is None:
+        return None
+    return stream.download(os.path.join(download_path, "analysis"))
+
+def hd_frame_source(yt, max_height=1080):
+    """URL of the highest resolution H.264 MP4 video stream up to max_height, for fetching just the scene frames by seeking.
+
+    YouTube serves 1440p and up as AV1 or VP9, which many OpenCV builds cannot decode a seeked frame from.
+    """
+    def seekable(stream):
+        return (stream.video_codec or "").startswith("avc1") and bool(stream.resolution) and int(stream.resolution.rstrip("p")) <= max_height
+
+    stream = yt.streams.filter(only_video=True, file_extension="mp4", custom_filter_functions=[seekable]).order_by("resolution").desc().first()
+    stream = stream or yt.streams.get_highest_resolution()
+    return stream.url if stream is not None else None
+
+def download_and_process_video(yt, download_path, output_base_path, fingerprint_index=None, low_res_analysis=True, recognizer=None):
+    """Download a video and then process it, skipping it if the same content was already processed.
+
+    With low_res_analysis, only the smallest rendition is downloaded. Scenes are detected and audio
+    transcribed from it, and the scene JPEGs are read from the HD stream at the cut timestamps.
+    """
     try:
-        video = yt.streams.get_highest_resolution()
-        video_path = video.download(download_path)
+        if fingerprint_index is not None and yt.video_id in fingerprint_index:
+            print(f"Skipping {yt.watch_url}: already processed")
+            return
+        analysis_path = fingerprint = None
+        duration = yt.length
+        if fingerprint_index is not None or low_res_analysis:
+            analysis_path = download_analysis_rendition(yt, download_path)
+        if fingerprint_index is not None and analysis_path is not None:
+            # Re-uploads and mirrors are recognised from the small rendition before anything else is fetched;
+            # frames from start to end must match and the lengths agree
+            duration = duration or video_duration(analysis_path)
+            fingerprint = temporal_fingerprint(analysis_path)
+            match = fingerprint_index.find(fingerprint, duration) if duration else None
+            if match is not None:
+                print(f"Skipping {yt.watch_url}: same video as {match[0]['video_id']} already processed")
+                os.remove(analysis_path)
+                return
+        frame_source = None
+        if low_res_analysis and analysis_path is not None:
+            video_path = analysis_path
+            frame_source = hd_frame_source(yt)
+        else:
+            if analysis_path is not None:
+                os.remove(analysis_path)
+            video_path = yt.streams.get_highest_resolution().download(download_path)
         print(f"Downloaded video {yt.title} to {video_path}")
-        process_video(video_path, yt, output_base_path)
+        process_video(video_path, yt, output_base_path, frame_source, recognizer)
+        if fingerprint_index is not None:
+            fingerprint_index.add(yt.video_id, fingerprint if fingerprint is not None else temporal_fingerprint(video_path), video_path,
+                                  duration or video_duration(video_path))
     except Exception as e:
         print(f"Failed to download video {yt.watch_url}: {e}")
 
-def download_videos_from_playlist(playlist_url, download_path, output_base_path):
+def download_videos_from_playlist(playlist_url, download_path, output_base_path, fingerprint_index=None, recognizer=None):
     """Download all videos from a YouTube playlist and process each immediately after downloading."""
     playlist = Playlist(playlist_url)
     create_directory(download_path)
     for url in playlist.video_urls:
         try:
             yt = YouTube(url)
-            download_and_process_video(yt, download_path, output_base_path)
+            download_and_process_video(yt, download_path, output_base_path, fingerprint_index, recognizer=recognizer)
         except AgeRestrictedError as e:
             print(f"Video {url} is age restricted and cannot be downloaded. Skipping.")
         except Exception as e:
             print(f"Failed to download video {url}: {e}")
 
-def process_video(video_path, yt, output_base_path):
+def process_video(video_path, yt, output_base_path, frame_source=None, recognizer=None):
     """Process a single video file including scene detection, transcription, creating a storyboard, and saving metadata."""
     print(f"Processing video: {video_path}")
     video_base_name = os.path.splitext(os.path.basename(video_path))[0]
     video_output_path = os.path.join(output_base_path, video_base_name)
     create_directory(video_output_path)
 
-    detect_cuts_and_create_storyboard(video_path, video_output_path)
-    transcribe_audio(video_path, video_output_path)
+    try:
+        # One demux pass feeds frames to scene detection and 16 kHz PCM to transcription
+        reader = MediaReader(video_path)
+    except ImportError as e:
+        print(f"{e}. Reading video and audio separately.")
+        reader = None
+    hash_index = FrameHashIndex(os.path.join(output_base_path, "scene_hashes.tsv"))
+    try:
+        detect_cuts_and_create_storyboard(video_path, video_output_path, cache=SceneCache(), hash_index=hash_index, frame_source=frame_source,
+                                          open_source=reader.open_video if reader is not None else None)
+        pcm = reader.read_audio() if reader is not None else None
+    finally:
+        # Also stops the reader thread and closes the file when detection fails
+        if reader is not None:
+            reader.close()
+    transcribe_audio(video_path, video_output_path, pcm=pcm, sample_rate=16000, recognizer=recognizer, cache=TranscriptCache())
 
     # Fetch and save metadata
     metadata = fetch_metadata(yt)
     save_metadata(metadata, video_output_path)
 
-def main(playlist_urls, download_path, output_base_path):
-    """Process videos from multiple playlist URLs."""
+def main(playlist_urls, download_path, output_base_path, backend="google", language="en-US"):
+    """Process videos from multiple playlist URLs, transcribing with the named recognizer backend in language."""
+    # Created once, so an offline model is loaded a single time for the whole run
+    recognizer = get_backend(backend, language=language)
+    # Videos listed in several playlists or re-uploaded under a new ID are only processed once
+    fingerprint_index = VideoFingerprintIndex(os.path.join(output_base_path, "video_fingerprints"))
     for playlist_url in playlist_urls:
         print(f"Processing playlist: {playlist_url}")
-        download_videos_from_playlist(playlist_url, download_path, output_base_path)
+        download_videos_from_playlist(playlist_url, download_path, output_base_path, fingerprint_index, recognizer)
 
 if __name__ == "__main__":
     playlist_urls = ['https://www.youtube.com/watch?v=yrMU7-jBXFY&list=PLljiqTkDjp_FUM_jys4wpWwrYpeSBzIeo',
@@ -0,0 +1,150 @@
+import cv2
+import os
+import time
+import tempfile
+import numpy as np
+from scene_detection import iter_sampled_frames, detect_scene_changes_parallel, iter_keyframes, compute_scores, adaptive_cut_positions
+from video_source import open_video_source
+from frame_bus import run_frame_bus, CutAnalyzer, BlackFrameAnalyzer, DifferenceHashAnalyzer, ThumbnailAnalyzer
+
+def create_synthetic_video(video_path, width=1280, height=720, fps=30, duration=20, scene_length=2):
+    """Write a synthetic test video with a hard cut every scene_length seconds."""
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    scene = None
+    for frame_number in range(int(fps * duration)):
+        if frame_number % int(fps * scene_length) == 0:
+            scene = rng.integers(0, 256, (4, 6, 3), dtype=np.uint8)
+            scene = cv2.resize(scene, (width, height), interpolation=cv2.INTER_CUBIC)
+            box_color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        frame = scene.copy()
+        offset = (frame_number % int(fps * scene_length)) * width // int(fps * scene_length * 2)
+        cv2.rectangle(frame, (offset, height // 3), (offset + width // 8, height // 3 + height // 6), box_color, -1)
+        writer.write(frame)
+    writer.release()
+    return video_path
+
+def read_every_frame(video_path, frame_check_interval=30):
+    """Baseline: the cap.read() loop the scripts used before, keeping one frame in frame_check_interval."""
+    cap = cv2.VideoCapture(video_path)
+    samples = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if cap.get(cv2.CAP_PROP_POS_FRAMES) % frame_check_interval == 0:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            samples += 1
+    cap.release()
+    return samples
+
+def read_sampled_frames(video_path, sample_interval=1.0, seek=False):
+    """Sample one frame per sample_interval seconds with the grab/seek engine."""
+    cap = cv2.VideoCapture(video_path)
+    samples = 0
+    for frame_index, timestamp, frame in iter_sampled_frames(cap, sample_interval, seek=seek):
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        samples += 1
+    cap.release()
+    return samples
+
+def detect_in_shards(video_path, workers, sample_interval=1.0):
+    """Run the time-sharded detector with the given number of worker processes."""
+    return len(detect_scene_changes_parallel(video_path, workers, sample_interval=sample_interval))
+
+def read_keyframes(video_path):
+    """Decode only the I-frames through PyAV."""
+    return sum(1 for sample in iter_keyframes(video_path))
+
+def read_with_source(video_path, sample_interval=1.0, **options):
+    """Sample frames through a video_source backend configured with options."""
+    source = open_video_source(video_path, **options)
+    samples = sum(1 for sample in iter_sampled_frames(source, sample_interval))
+    source.release()
+    return samples
+
+DECODE_BACKENDS = [
+    ("opencv default", {"backend": "opencv"}),
+    ("opencv 1 thread", {"backend": "opencv", "threads": 1}),
+    ("opencv gray 64px", {"backend": "opencv", "pixel_format": "gray", "output_width": 64}),
+    ("pyav bgr", {"backend": "pyav"}),
+    ("pyav 1 thread", {"backend": "pyav", "threads": 1}),
+    ("pyav slice threads", {"backend": "pyav", "thread_type": "SLICE"}),
+    ("pyav gray 64px", {"backend": "pyav", "pixel_format": "gray", "output_width": 64}),
+]
+
+def make_analyzers():
+    return [CutAnalyzer(), BlackFrameAnalyzer(), DifferenceHashAnalyzer(), ThumbnailAnalyzer()]
+
+def analyze_separately(video_path, sample_interval=1.0):
+    """Baseline for the frame bus: every analyzer decodes the video on its own."""
+    analyzers = make_analyzers()
+    for analyzer in analyzers:
+        cap = cv2.VideoCapture(video_path)
+        for frame_index, timestamp, frame in iter_sampled_frames(cap, sample_interval):
+            analyzer.process(frame_index, timestamp, frame)
+        cap.release()
+    return sum(len(analyzer.result()) for analyzer in analyzers)
+
+def analyze_on_frame_bus(video_path, sample_interval=1.0):
+    """Decode once and fan the frames out to the analyzers through shared memory."""
+    return sum(len(result) for result in run_frame_bus(video_path, make_analyzers(), sample_interval))
+
+def print_cut_recall(label, found, expected):
+    hits = len(np.intersect1d(found, expected))
+    print(f"{label:<28} {hits:>3}/{len(expected):<3} cuts found, {len(found) - hits} extra")
+
+def report_adaptive_cut_train(video_path, spacings=(2, 3, 5), sample_interval=1.0, scene_length=2):
+    """Report how many cuts the adaptive rule finds in regularly spaced cut trains, fast cutting included.
+
+    Synthetic score signals with a cut every spacing samples over quiet and busy shots come first,
+    then the scores of the synthetic video, which cuts every scene_length samples.
+    """
+    rng = np.random.default_rng(0)
+    for spacing in spacings:
+        for shot, motion in (("quiet", 0.02), ("busy", 0.15)):
+            scores = rng.uniform(0.5 * motion, 1.5 * motion, 300)
+            cuts = np.arange(spacing, len(scores) - spacing, spacing)
+            scores[cuts] = rng.uniform(0.6, 0.95, len(cuts))
+            print_cut_recall(f"adaptive, every {spacing}, {shot}", adaptive_cut_positions(scores), cuts)
+    times, scores = compute_scores(video_path, sample_interval=sample_interval)
+    print_cut_recall("adaptive, synthetic video", adaptive_cut_positions(scores), np.flatnonzero(np.diff(times[:, 1] // scene_length) > 0))
+
+def time_run(label, func, *args, video_duration, **kwargs):
+    """Run func once and print its throughput as a multiple of real time."""
+    start = time.perf_counter()
+    results = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {results:>5} results  {elapsed:7.3f}s  {video_duration / elapsed:7.1f}x real time")
+    return elapsed
+
+def main(width=1280, height=720, fps=30, duration=20):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = create_synthetic_video(os.path.join(temp_dir, "synthetic.mp4"), width, height, fps, duration)
+        print(f"Synthetic video: {width}x{height} @ {fps} fps, {duration}s")
+        report_adaptive_cut_train(video_path)
+        baseline = time_run("cap.read() every frame", read_every_frame, video_path, video_duration=duration)
+        grabbed = time_run("grab() + retrieve() 1.0s", read_sampled_frames, video_path, 1.0, video_duration=duration)
+        seeked = time_run("seek 1.0s", read_sampled_frames, video_path, 1.0, seek=True, video_duration=duration)
+        print(f"Speedup grab: {baseline / grabbed:.2f}x, seek: {baseline / seeked:.2f}x")
+        try:
+            keyframes = time_run("PyAV keyframes only", read_keyframes, video_path, video_duration=duration)
+            print(f"Speedup keyframes: {baseline / keyframes:.2f}x")
+        except ImportError as e:
+            print(f"Skipping keyframe benchmark: {e}")
+        single = None
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            elapsed = time_run(f"{workers} shard worker(s)", detect_in_shards, video_path, workers, video_duration=duration)
+            single = single or elapsed
+            print(f"  scaling vs 1 worker: {single / elapsed:.2f}x")
+        for label, options in DECODE_BACKENDS:
+            try:
+                time_run(label, read_with_source, video_path, 1.0 / fps, video_duration=duration, **options)
+            except ImportError as e:
+                print(f"Skipping {label}: {e}")
+        separate = time_run("4 analyzers, 4 decodes", analyze_separately, video_path, 0.1, video_duration=duration)
+        shared = time_run("4 analyzers, frame bus", analyze_on_frame_bus, video_path, 0.1, video_duration=duration)
+        print(f"Speedup frame bus: {separate / shared:.2f}x")
+
+if __name__ == "__main__":
+    main()
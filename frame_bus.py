@@ -0,0 +1,200 @@
+import cv2
+import queue
+import time
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from scene_detection import iter_sampled_frames, downscale_frame, get_metric, CutEvent, SIGNAL_WIDTH
+from frame_hash_index import dhash
+
+class CutAnalyzer:
+    """Hard-cut detection on the bus, reporting CutEvents without frames (see attach_frames)."""
+
+    def __init__(self, change_threshold=0.36, metric="changed_pixels", signal_width=SIGNAL_WIDTH):
+        self.change_threshold = change_threshold
+        self.scene_metric = get_metric(metric)
+        self.signal_width = signal_width
+        self.prev_signal = None
+        self.scene_changes = []
+
+    def process(self, frame_index, timestamp, frame):
+        signal = self.scene_metric.prepare(downscale_frame(frame, self.signal_width))
+        if self.prev_signal is not None:
+            score = self.scene_metric.distance(self.prev_signal, signal)
+            if score > self.change_threshold:
+                self.scene_changes.append(CutEvent(frame_index, timestamp, score, None))
+        self.prev_signal = signal
+
+    def result(self):
+        return self.scene_changes
+
+class BlackFrameAnalyzer:
+    """Timestamps of samples whose mean brightness is below black_level."""
+
+    def __init__(self, black_level=16, signal_width=SIGNAL_WIDTH):
+        self.black_level = black_level
+        self.signal_width = signal_width
+        self.black_frames = []
+
+    def process(self, frame_index, timestamp, frame):
+        if downscale_frame(frame, self.signal_width).mean() < self.black_level:
+            self.black_frames.append((frame_index, timestamp))
+
+    def result(self):
+        return self.black_frames
+
+class DifferenceHashAnalyzer:
+    """Difference hash of every sample (64 bits by default), for spotting repeated shots."""
+
+    def __init__(self, hash_size=8):
+        self.hash_size = hash_size
+        self.hashes = []
+
+    def process(self, frame_index, timestamp, frame):
+        self.hashes.append((frame_index, dhash(frame, self.hash_size)))
+
+    def result(self):
+        return self.hashes
+
+class ThumbnailAnalyzer:
+    """Small copies of every sample, e.g. for a contact sheet."""
+
+    def __init__(self, width=160):
+        self.width = width
+        self.thumbnails = []
+
+    def process(self, frame_index, timestamp, frame):
+        self.thumbnails.append((frame_index, downscale_frame(frame, self.width)))
+
+    def result(self):
+        return self.thumbnails
+
+def _acquire(semaphore, stop_event):
+    """Wait on a semaphore, giving up and returning False once the bus is stopped."""
+    while not semaphore.acquire(timeout=0.1):
+        if stop_event.is_set():
+            return False
+    return True
+
+def _attach(shm_name, frame_shape, slots):
+    """Map the bus's shared memory in a child process as (shm, frames, metadata) arrays."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots,) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+    metadata = np.ndarray((slots, 2), dtype=np.float64, buffer=shm.buf, offset=frames.nbytes)
+    return shm, frames, metadata
+
+def _decoder(video_path, sample_interval, shm_name, frame_shape, slots, ready, free, frame_total, stop_event, results):
+    shm, frames, metadata = _attach(shm_name, frame_shape, slots)
+    cap = cv2.VideoCapture(video_path)
+    sequence = 0
+    try:
+        for frame_index, timestamp, frame in iter_sampled_frames(cap, sample_interval):
+            # Back-pressure: the slot is reused only after every analyzer has released its previous frame
+            if not all(_acquire(semaphore, stop_event) for semaphore in free):
+                return
+            slot = frames[sequence % slots]
+            if frame.shape == frame_shape:
+                np.copyto(slot, frame)
+            else:
+                cv2.resize(frame, (frame_shape[1], frame_shape[0]), dst=slot, interpolation=cv2.INTER_AREA)
+            metadata[sequence % slots] = (frame_index, timestamp)
+            for semaphore in ready:
+                semaphore.release()
+            sequence += 1
+    except Exception as e:
+        results.put(("decoder", None, repr(e), 0.0))
+        stop_event.set()
+    finally:
+        cap.release()
+        del frames, metadata
+        shm.close()
+        frame_total.value = sequence
+        for semaphore in ready:
+            semaphore.release()
+
+def _analyzer(position, analyzer, shm_name, frame_shape, slots, ready, free, frame_total, stop_event, results):
+    shm, frames, metadata = _attach(shm_name, frame_shape, slots)
+    busy_seconds = 0.0
+    sequence = 0
+    try:
+        while _acquire(ready, stop_event):
+            if frame_total.value >= 0 and sequence >= frame_total.value:
+                break
+            frame_index, timestamp = metadata[sequence % slots]
+            start = time.perf_counter()
+            # The frame is a view into the ring; analyzers must copy anything they keep
+            analyzer.process(int(frame_index), float(timestamp), frames[sequence % slots])
+            busy_seconds += time.perf_counter() - start
+            free.release()
+            sequence += 1
+        results.put((position, analyzer.result(), None, busy_seconds))
+    except Exception as e:
+        results.put((position, None, repr(e), busy_seconds))
+        stop_event.set()
+    finally:
+        del frames, metadata
+        shm.close()
+
+def run_frame_bus(video_path, analyzers, sample_interval=1.0, slots=8, frame_width=None, print_stats=False):
+    """Decode a video once and feed every sampled frame to several analyzer processes.
+
+    A decoder process writes frames into a ring of slots frames in shared memory and each analyzer
+    process reads them in place, without pickling or copying. The decoder reuses a slot only after
+    every analyzer is done with it, so a slow analyzer throttles decoding instead of letting memory
+    grow. Analyzers are picklable objects with process(frame_index, timestamp, frame) and result();
+    frame_width shrinks frames before they go on the bus when no analyzer needs full resolution.
+
+    Returns the analyzers' results in the order they were given.
+    """
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if not width or not height:
+        raise ValueError(f"Could not open video: {video_path}")
+    if frame_width is not None and frame_width < width:
+        height = max(1, int(round(height * frame_width / float(width))))
+        width = frame_width
+    frame_shape = (height, width, 3)
+    frame_bytes = slots * height * width * 3
+
+    shm = shared_memory.SharedMemory(create=True, size=frame_bytes + slots * 2 * 8)
+    ready = [mp.Semaphore(0) for _ in analyzers]
+    free = [mp.Semaphore(slots) for _ in analyzers]
+    frame_total = mp.Value("q", -1)
+    stop_event = mp.Event()
+    results = mp.Queue()
+    bus = (shm.name, frame_shape, slots)
+    processes = [mp.Process(target=_decoder, args=(video_path, sample_interval) + bus + (ready, free, frame_total, stop_event, results),
+                            name="frame-bus-decoder", daemon=True)]
+    for position, analyzer in enumerate(analyzers):
+        processes.append(mp.Process(target=_analyzer, args=(position, analyzer) + bus + (ready[position], free[position], frame_total, stop_event, results),
+                                    name=f"frame-bus-{type(analyzer).__name__}", daemon=True))
+    try:
+        for process in processes:
+            process.start()
+        outputs = [None] * len(analyzers)
+        for _ in analyzers:
+            while True:
+                try:
+                    position, output, error, busy_seconds = results.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    crashed = [process.name for process in processes if process.exitcode not in (None, 0)]
+                    if crashed:
+                        raise RuntimeError(f"Frame bus process {crashed[0]} exited unexpectedly")
+            if error is not None:
+                raise RuntimeError(f"Frame bus {position} failed: {error}")
+            outputs[position] = output
+            if print_stats:
+                print(f"{type(analyzers[position]).__name__:<24} busy={busy_seconds:.2f}s")
+        for process in processes:
+            process.join()
+        return outputs
+    finally:
+        stop_event.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,119 @@
+import cv2
+import os
+import threading
+import numpy as np
+
+def phash(frame, hash_size=8, highfreq_factor=4):
+    """64-bit perceptual hash: the signs of the lowest DCT frequencies of a small gray copy, against their median."""
+    size = hash_size * highfreq_factor
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = (low > np.median(low)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def dhash(frame, hash_size=8):
+    """64-bit difference hash: whether each pixel of a small gray copy is brighter than its left neighbour."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+HASH_FUNCTIONS = {
+    "phash": phash,
+    "dhash": dhash,
+}
+
+def hamming_distance(a, b):
+    """Number of differing bits between two integer hashes."""
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree of integer hashes for nearest-neighbour search under Hamming distance.
+
+    Each node keeps its children by their distance to it, so a search within max_distance only
+    descends into children whose distance lies within max_distance of the query's own distance,
+    which skips most of the tree for small radii.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, payload):
+        """Insert a hash with its payload. An exact duplicate hash keeps the payload it was first added with."""
+        if self.root is None:
+            self.root = (value, payload, {})
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, payload, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Return (distance, hash, payload) for every entry within max_distance of value, closest first."""
+        matches = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node_value, payload, children = nodes.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                matches.append((distance, node_value, payload))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    nodes.append(child)
+        return sorted(matches, key=lambda match: match[0])
+
+class FrameHashIndex:
+    """On-disk index of the perceptual hashes of saved scene frames, for finding near-duplicates.
+
+    The file holds one "<hash in hex>\\t<path>" line per frame and is only ever appended to, so it stays
+    small (about 100 bytes per scene) and survives interrupted runs. It is loaded into a BKTree when
+    opened. One index can be shared by every video in a playlist run, so intros, outros and title
+    cards repeated across videos are recognised.
+    """
+
+    def __init__(self, index_path, max_distance=6, hash_function="phash"):
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash function '{hash_function}'. Available hash functions: {', '.join(HASH_FUNCTIONS)}")
+        self.index_path = index_path
+        self.max_distance = max_distance
+        self.hash_function = HASH_FUNCTIONS[hash_function]
+        self.tree = BKTree()
+        self.lock = threading.Lock()
+        self.duplicates = 0
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    value, _, path = line.rstrip("\n").partition("\t")
+                    if path:
+                        self.tree.add(int(value, 16), path)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+    def hash(self, frame):
+        return self.hash_function(frame)
+
+    def find(self, value):
+        """Path of the closest indexed frame within max_distance of a hash whose file still exists, or None."""
+        with self.lock:
+            matches = self.tree.search(value, self.max_distance)
+        for distance, match_value, path in matches:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def add(self, value, path):
+        """Index a frame hash under the path its JPEG is saved to."""
+        with self.lock:
+            self.tree.add(value, path)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(f"{value:016x}\t{path}\n")
@@ -0,0 +1,184 @@
+import cv2
+import queue
+import threading
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+class QueueCapture:
+    """Capture-like reading end of a MediaReader's video queue, for iter_sampled_frames and the scene detectors.
+
+    Frames come in decode order and cannot be seeked. grab() takes the next decoded frame off the queue
+    and retrieve() converts it to BGR, so frames that are skipped between samples are never converted.
+    """
+
+    def __init__(self, frame_queue, fps, frame_count, width, height, closed):
+        self.frame_queue = frame_queue
+        self.fps = fps
+        self.frame_count = frame_count
+        self.width = width
+        self.height = height
+        self.closed = closed
+        self.current = None
+        self.position = 0
+
+    def isOpened(self):
+        return not self.closed.is_set()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def grab(self):
+        if self.closed.is_set():
+            return False
+        self.current = self.frame_queue.get()
+        if self.current is None:
+            self.closed.set()
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        if self.current is None:
+            return False, None
+        return True, self.current.to_ndarray(format="bgr24")
+
+    def read(self):
+        return self.retrieve() if self.grab() else (False, None)
+
+    def release(self):
+        """Stop taking frames; the reader then skips decoding video and only keeps demuxing audio."""
+        self.closed.set()
+        while True:
+            try:
+                self.frame_queue.get_nowait()
+            except queue.Empty:
+                break
+
+class MediaReader:
+    """Demux a video file once and feed its frames and its audio to two consumers at the same time.
+
+    A reader thread walks the container's packets in file order. Video frames go into a bounded queue
+    read through the QueueCapture in .video, which the scene detectors accept in place of a
+    cv2.VideoCapture; a full queue holds the reader back. Audio is resampled to sample_rate mono
+    16-bit PCM on the way and collected in an unbounded queue (about 115 MB per hour at 16 kHz) for
+    iter_audio() or read_audio(). Until the video side is released with close_video(), which
+    read_audio() also does, the reader decodes frames ahead of the consumer and waits while the queue
+    is full, holding back the audio too; call close_video() first when nothing will read the frames.
+    After that, video packets are dropped without being decoded and the audio runs on to the end.
+    close(), or leaving a with block, stops the reader early and closes the file.
+    """
+
+    def __init__(self, video_path, sample_rate=16000, frame_queue_size=16, threads=0):
+        if av is None:
+            raise ImportError("Single-pass reading needs PyAV. Install it with: pip install av")
+        self.video_path = video_path
+        self.sample_rate = sample_rate
+        self.container = av.open(video_path)
+        self.video_stream = self.container.streams.video[0] if self.container.streams.video else None
+        self.audio_stream = self.container.streams.audio[0] if self.container.streams.audio else None
+        self.frame_queue = queue.Queue(maxsize=frame_queue_size)
+        self.audio_queue = queue.Queue()
+        self.video_closed = threading.Event()
+        self.stopped = threading.Event()
+        self.error = None
+        fps = frame_count = width = height = 0
+        if self.video_stream is not None:
+            self.video_stream.thread_type = "AUTO"
+            self.video_stream.codec_context.thread_count = threads
+            fps = float(self.video_stream.average_rate or self.video_stream.guessed_rate or 0)
+            frame_count = self.video_stream.frames
+            width, height = self.video_stream.codec_context.width, self.video_stream.codec_context.height
+        else:
+            self.video_closed.set()
+        self.video = QueueCapture(self.frame_queue, fps, frame_count, width, height, self.video_closed)
+        self.thread = threading.Thread(target=self._demux, name="media-reader", daemon=True)
+        self.thread.start()
+
+    def open_video(self, video_path=None):
+        """open_source callable for iter_scene_changes_parallel with workers=1; returns .video whatever the path."""
+        return self.video
+
+    def _put_frame(self, frame):
+        while not self.video_closed.is_set():
+            try:
+                self.frame_queue.put(frame, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _demux(self):
+        streams = [stream for stream in (self.video_stream, self.audio_stream) if stream is not None]
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=self.sample_rate) if self.audio_stream is not None else None
+        try:
+            for packet in self.container.demux(streams):
+                if self.stopped.is_set():
+                    break
+                if packet.stream is self.audio_stream:
+                    for frame in packet.decode():
+                        for resampled in resampler.resample(frame):
+                            self.audio_queue.put(resampled.to_ndarray().reshape(-1))
+                elif not self.video_closed.is_set():
+                    for frame in packet.decode():
+                        self._put_frame(frame)
+            if resampler is not None:
+                for resampled in resampler.resample(None):
+                    self.audio_queue.put(resampled.to_ndarray().reshape(-1))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.container.close()
+            self.audio_queue.put(None)
+            self._put_frame(None)
+
+    def close_video(self):
+        """Tell the reader no more frames will be read."""
+        self.video.release()
+
+    def close(self):
+        """Stop reading and wait for the reader thread to close the file. Safe to call more than once."""
+        self.stopped.set()
+        self.close_video()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def iter_audio(self):
+        """Yield int16 PCM chunks as they are demuxed, until the end of the file."""
+        while True:
+            chunk = self.audio_queue.get()
+            if chunk is None:
+                break
+            yield chunk
+
+    def read_audio(self):
+        """Wait for the whole file to be read and return its audio as one int16 array. Raises any reader error.
+
+        Frames nobody has read by then are dropped, as the reader could otherwise wait on the video queue forever.
+        """
+        self.close_video()
+        chunks = list(self.iter_audio())
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
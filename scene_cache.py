@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import time
+from scene_detection import CutEvent, attach_frames, video_fingerprint
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "youtube_transcripts", "scenes")
+
+class SceneCache:
+    """Persistent on-disk cache of scene-detection results.
+
+    Entries are small JSON files holding (frame_index, timestamp, score) for each cut, keyed by the
+    video fingerprint and the detector parameters. Least recently used entries are removed once the
+    cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, video_path, **params):
+        """Cache key for a video and the parameters its cuts were detected with."""
+        payload = json.dumps({"video": video_fingerprint(video_path), "params": params}, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached [(frame_index, timestamp, score), ...] for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                scene_changes = json.load(f)["scene_changes"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        os.utime(path)  # Mark as recently used
+        self.hits += 1
+        return [tuple(entry) for entry in scene_changes]
+
+    def put(self, key, scene_changes):
+        """Store the cuts for key, then evict old entries if the cache is over its size cap."""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "scene_changes": [list(entry) for entry in scene_changes]}, f)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+
+    def wrap(self, video_path, scene_changes, **params):
+        """Serve a stream of CutEvents from the cache, or record it on a miss.
+
+        scene_changes must be a lazy generator. On a hit it is never started, so the video is not
+        decoded; only the cut frames themselves are read back by seeking to the stored frame indices.
+        On a miss the events are passed through and stored once the stream has run to the end.
+        """
+        key = self.key(video_path, **params)
+        cached = self.get(key)
+        if cached is not None:
+            print(f"Scene cache hit for {video_path}: {len(cached)} scenes")
+            yield from attach_frames(video_path, (CutEvent(frame_index, timestamp, score, None) for frame_index, timestamp, score in cached))
+            return
+        recorded = []
+        for event in scene_changes:
+            recorded.append((event.frame_index, event.timestamp, event.score))
+            yield event
+        self.put(key, recorded)
@@ -0,0 +1,1045 @@
+import cv2
+import hashlib
+import json
+import math
+import os
+import queue
+import threading
+import time
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from video_source import video_source_factory
+
+try:
+    import av
+except ImportError:
+    av = None
+
+def get_video_fps(cap, default_fps=30.0):
+    """Return the frame rate reported by a capture, falling back to a default when it is missing."""
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps != fps or fps <= 0:
+        return default_fps
+    return fps
+
+def frames_to_seconds(frame_check_interval, fps):
+    """Convert the legacy frame_check_interval into a sampling interval in seconds."""
+    return frame_check_interval / float(fps)
+
+def sample_frame_index(sample_number, step, fps):
+    """Frame index of the sample_number-th sample on a grid of step seconds."""
+    return int(sample_number * step * fps + 0.5)
+
+def iter_sampled_frames(cap, sample_interval=1.0, start_time=0.0, end_time=None, seek=False):
+    """Yield (frame_index, timestamp, frame) for one frame every sample_interval seconds.
+
+    Frames between samples are advanced with cap.grab() and never retrieved, so they skip the
+    BGR conversion and copy. With seek=True the capture jumps straight to each sampled frame
+    instead, which is faster for long intervals on files with frequent keyframes.
+
+    Samples always fall on the same grid of multiples of sample_interval, whatever start_time is,
+    so separate time ranges of one video can be sampled independently and stitched back together.
+    """
+    fps = get_video_fps(cap)
+    step = max(sample_interval, 1.0 / fps)
+    sample_number = int(math.ceil(start_time / step - 1e-9))
+    next_index = sample_frame_index(sample_number, step, fps)
+    if next_index > 0 or seek:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, next_index)
+    frame_index = next_index
+    while True:
+        if end_time is not None and sample_number * step >= end_time - 1e-9:
+            break
+        timestamp = next_index / fps
+        if seek:
+            if frame_index != next_index:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, next_index)
+                frame_index = next_index
+            ret, frame = cap.read()
+            if not ret:
+                break
+        else:
+            while frame_index < next_index:
+                if not cap.grab():
+                    return
+                frame_index += 1
+            if not cap.grab():
+                break
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+        frame_index += 1
+        yield next_index, timestamp, frame
+        sample_number += 1
+        next_index = max(sample_frame_index(sample_number, step, fps), frame_index)
+
+SIGNAL_WIDTH = 64
+
+SceneMetric = namedtuple("SceneMetric", ["prepare", "distance"])
+
+CutEvent = namedtuple("CutEvent", ["frame_index", "timestamp", "score", "frame"])
+
+def downscale_frame(frame, width=SIGNAL_WIDTH):
+    """Shrink a BGR frame to a small fixed width, keeping the aspect ratio."""
+    height = max(1, int(round(frame.shape[0] * width / float(frame.shape[1]))))
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+FrameRegion = namedtuple("FrameRegion", ["crop", "mask"])
+
+def downscale_region(frame, region=None, width=SIGNAL_WIDTH):
+    """Downscale only the region of interest of a frame, blanking masked pixels.
+
+    region.crop is an (x, y, w, h) box in source pixels and region.mask a boolean array at the
+    downscaled size with True for pixels to ignore; either may be None.
+    """
+    if region is None:
+        return downscale_frame(frame, width)
+    if region.crop is not None:
+        x, y, w, h = region.crop
+        frame = frame[y:y + h, x:x + w]
+    small_frame = downscale_frame(frame, width)
+    if region.mask is not None:
+        small_frame[region.mask] = 0
+    return small_frame
+
+def detect_letterbox(gray_samples, black_level=24):
+    """Find the (x, y, w, h) box inside black bars from a stack of grayscale samples.
+
+    A row or column counts as a bar when it stays darker than black_level in every sample.
+    """
+    brightest = gray_samples.max(axis=0)
+    content_rows = np.flatnonzero(brightest.max(axis=1) > black_level)
+    content_cols = np.flatnonzero(brightest.max(axis=0) > black_level)
+    if len(content_rows) == 0 or len(content_cols) == 0:
+        return 0, 0, gray_samples.shape[2], gray_samples.shape[1]
+    return (int(content_cols[0]), int(content_rows[0]),
+            int(content_cols[-1] - content_cols[0] + 1), int(content_rows[-1] - content_rows[0] + 1))
+
+def detect_static_overlay(gray_samples, max_std=3.0, max_fraction=0.25):
+    """Mask of pixels that barely change across samples spread over the video, such as logos and ticker boxes.
+
+    Returns None when nothing is static, or when so much is static that the video itself is mostly
+    still (slides, talking heads), since masking would then hide real cuts.
+    """
+    static = gray_samples.std(axis=0) < max_std
+    if not static.any() or static.mean() > max_fraction:
+        return None
+    return cv2.dilate(static.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+
+def analyze_frame_region(video_path, sample_count=12, analysis_width=160, manual_roi=None, signal_width=SIGNAL_WIDTH,
+                         find_letterbox=True, find_overlays=True):
+    """Pre-pass that works out which part of the frame scene detection should look at.
+
+    A few frames spread over the video are read by seeking and shrunk to analysis_width. Black bars are
+    cropped away and static overlays masked. manual_roi, an (x, y, w, h) box in source pixels, replaces
+    the automatic crop and is clipped to the frame; a box wholly outside it raises ValueError. Returns a
+    FrameRegion for downscale_region, or None if the whole frame is used.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        samples = []
+        for i in range(sample_count):
+            frame = read_frame_at(cap, frame_count * (2 * i + 1) // (2 * sample_count))
+            if frame is not None:
+                samples.append(cv2.cvtColor(downscale_frame(frame, analysis_width), cv2.COLOR_BGR2GRAY))
+    finally:
+        cap.release()
+    if not samples or not width:
+        return None
+    gray_samples = np.stack(samples).astype(np.float32)
+    scale = width / float(analysis_width)
+
+    if manual_roi is not None:
+        # The crop and the mask are both sized from the box, so it must lie inside the frame
+        x, y, w, h = (int(v) for v in manual_roi)
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(width, x + w), min(height, y + h)
+        if right <= left or bottom <= top:
+            raise ValueError(f"ROI {tuple(manual_roi)} lies outside the {width}x{height} frame")
+        crop = (left, top, right - left, bottom - top)
+    elif find_letterbox:
+        x, y, w, h = detect_letterbox(gray_samples)
+        crop = (int(x * scale), int(y * scale), int(w * scale), int(h * scale))
+        if (x, y, w, h) == (0, 0, gray_samples.shape[2], gray_samples.shape[1]):
+            crop = None
+    else:
+        crop = None
+
+    mask = None
+    if find_overlays:
+        x, y, w, h = crop or (0, 0, width, int(round(gray_samples.shape[1] * scale)))
+        ax, ay = int(x / scale), int(y / scale)
+        aw, ah = max(1, int(round(w / scale))), max(1, int(round(h / scale)))
+        overlay = detect_static_overlay(gray_samples[:, ay:ay + ah, ax:ax + aw])
+        if overlay is not None:
+            signal_height = max(1, int(round(h * signal_width / float(w))))
+            mask = cv2.resize(overlay.astype(np.uint8), (signal_width, signal_height), interpolation=cv2.INTER_NEAREST) > 0
+    if crop is None and mask is None:
+        return None
+    return FrameRegion(crop, mask)
+
+def to_gray(small_frame):
+    """Grayscale version of a BGR frame; frames that are already gray are returned unchanged."""
+    if small_frame.ndim == 2:
+        return small_frame
+    return cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+
+def gray_signal(small_frame):
+    """Luma plane of a downscaled frame as int16, so differences do not wrap around."""
+    return to_gray(small_frame).astype(np.int16)
+
+def hsv_histogram_signal(small_frame, bins=(16, 8, 8)):
+    """Normalized per-channel HSV histograms of a downscaled frame, concatenated into one vector."""
+    if small_frame.ndim == 2:
+        raise ValueError("The chi_square metric needs colour frames, not gray ones")
+    hsv = cv2.cvtColor(small_frame, cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.int32)
+    ranges = (180, 256, 256)
+    histograms = [np.bincount(hsv[:, c] * n // ranges[c], minlength=n) for c, n in enumerate(bins)]
+    return np.concatenate(histograms).astype(np.float32) / hsv.shape[0]
+
+def edge_signal(small_frame):
+    """Boolean edge map of a downscaled frame."""
+    return cv2.Canny(to_gray(small_frame), 50, 150) > 0
+
+def mean_absolute_difference(prev_signal, signal):
+    """Mean absolute luma difference, scaled to 0..1."""
+    return float(np.mean(np.abs(signal - prev_signal))) / 255.0
+
+def changed_pixel_ratio(prev_signal, signal, pixel_tolerance=12):
+    """Fraction of pixels whose luma changed by more than pixel_tolerance.
+
+    The defaults of 0.36 and 0.18 are the shares of a 1080p frame that the scripts' old
+    countNonZero(absdiff) thresholds of 750000 and 375000 pixels stood for, but the two tests are not
+    equivalent. The old count included any change at all, so compression noise and slight motion
+    counted towards it, while here changes of pixel_tolerance or less on the downscaled signal are
+    ignored. The same fraction therefore takes more real change to pass and gives fewer cuts on
+    noisy footage.
+    """
+    return float(np.mean(np.abs(signal - prev_signal) > pixel_tolerance))
+
+def histogram_chi_square(prev_signal, signal):
+    """Symmetric chi-square distance between concatenated histograms, scaled to 0..1."""
+    total = prev_signal + signal
+    squared = (prev_signal - signal) ** 2
+    chi = np.sum(np.divide(squared, total, out=np.zeros_like(total), where=total > 0))
+    return float(chi) / 2.0 / 3.0
+
+def edge_change_ratio(prev_signal, signal, dilation=1):
+    """Edge change ratio: the larger share of edges that appeared in, or vanished from, the new frame."""
+    kernel = np.ones((2 * dilation + 1, 2 * dilation + 1), np.uint8)
+    prev_dilated = cv2.dilate(prev_signal.astype(np.uint8), kernel) > 0
+    dilated = cv2.dilate(signal.astype(np.uint8), kernel) > 0
+    prev_edges = np.count_nonzero(prev_signal)
+    edges = np.count_nonzero(signal)
+    entering = np.count_nonzero(signal & ~prev_dilated) / edges if edges else 0.0
+    exiting = np.count_nonzero(prev_signal & ~dilated) / prev_edges if prev_edges else 0.0
+    return float(max(entering, exiting))
+
+METRICS = {
+    "changed_pixels": SceneMetric(gray_signal, changed_pixel_ratio),
+    "mad": SceneMetric(gray_signal, mean_absolute_difference),
+    "chi_square": SceneMetric(hsv_histogram_signal, histogram_chi_square),
+    "edge": SceneMetric(edge_signal, edge_change_ratio),
+}
+
+def get_metric(metric):
+    """Look up a metric by name, or pass a SceneMetric through unchanged."""
+    if isinstance(metric, SceneMetric):
+        return metric
+    if metric not in METRICS:
+        raise ValueError(f"Unknown scene metric '{metric}'. Available metrics: {', '.join(METRICS)}")
+    return METRICS[metric]
+
+class GradualTransitionDetector:
+    """Find fades and dissolves that are spread over several samples.
+
+    The last window grayscale samples are kept in a fixed NumPy ring buffer, together with the mean
+    absolute difference of each step between them. A gradual transition shows up as a large change
+    from the oldest sample to the newest that is the sum of several small steps in one direction:
+    no single step is a hard cut, and the steps add up to the total change instead of cancelling
+    out as they do for motion. All buffers are allocated up front, so update() does not allocate.
+    """
+
+    def __init__(self, window=6, threshold=0.08, coherence=0.6, max_step_share=0.5):
+        self.window = window
+        self.threshold = threshold
+        self.coherence = coherence
+        self.max_step_share = max_step_share
+        self.samples = None
+        self.steps = np.zeros(window, dtype=np.float64)
+        self.count = 0
+        self.cooldown = 0
+
+    def _allocate(self, small_frame):
+        height, width = small_frame.shape[:2]
+        self.samples = np.zeros((self.window, height, width), dtype=np.int16)
+        self.gray = np.zeros((height, width), dtype=np.uint8)
+        self.scratch = np.zeros((height, width), dtype=np.int16)
+
+    def _mean_abs_diff(self, a, b):
+        np.subtract(a, b, out=self.scratch)
+        np.abs(self.scratch, out=self.scratch)
+        return self.scratch.mean() / 255.0
+
+    def suppress(self):
+        """Skip the next window samples, e.g. after a hard cut that the pairwise detector already reported."""
+        self.cooldown = self.window
+
+    def update(self, small_frame):
+        """Add a downscaled BGR or gray sample. Returns a 0..1 transition score when a transition ends here, else None."""
+        if self.samples is None:
+            self._allocate(small_frame)
+        if small_frame.ndim == 2:
+            self.gray[:] = small_frame
+        else:
+            cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        slot = self.count % self.window
+        if self.count:
+            self.steps[slot] = self._mean_abs_diff(self.gray, self.samples[(self.count - 1) % self.window])
+        self.samples[slot] = self.gray
+        self.count += 1
+        if self.cooldown:
+            self.cooldown -= 1
+            return None
+        if self.count <= self.window:
+            return None
+        oldest = self.samples[self.count % self.window]
+        change = self._mean_abs_diff(self.gray, oldest)
+        if change <= self.threshold:
+            return None
+        # steps[oldest slot] is the step into the oldest sample, outside the window; slicing around it does not copy
+        outside = self.count % self.window
+        total_steps = self.steps.sum() - self.steps[outside]
+        if self.window > 1:
+            largest_step = max(self.steps[:outside].max(initial=0.0), self.steps[outside + 1:].max(initial=0.0))
+        else:
+            largest_step = change
+        if change >= self.coherence * total_steps and largest_step < self.max_step_share * change:
+            self.cooldown = self.window
+            return float(change)
+        return None
+
+def iter_scene_changes(cap, change_threshold=0.36, metric="changed_pixels", sample_interval=1.0, signal_width=SIGNAL_WIDTH, start_time=0.0, end_time=None, transition_window=0, region=None):
+    """Detect scene changes on downscaled samples of an open capture and yield each one as it is found.
+
+    Every sampled frame is shrunk to signal_width pixels wide before the metric runs, so the cost per
+    sample does not depend on the source resolution and change_threshold is a 0..1 score that means
+    the same thing at 360p and 1080p. Each CutEvent carries the full-resolution frame that starts the
+    new scene; only the current frame is held, so memory does not grow with the number of scenes.
+    The first sample at or after start_time is only used as the reference for the next one and is
+    never reported as a change.
+
+    With transition_window set, fades and dissolves are reported once each: a GradualTransitionDetector
+    over that many samples catches the slow ones, and a run of consecutive samples that all pass
+    change_threshold is merged into a single event at the sample where the run ends. That event is
+    held back until the next sample, so one extra frame is kept in memory.
+
+    region, from analyze_frame_region, limits the metrics to the cropped and unmasked part of the frame.
+    """
+    scene_metric = get_metric(metric)
+    transitions = GradualTransitionDetector(transition_window) if transition_window else None
+    prev_signal = None
+    pending = None
+    for frame_index, timestamp, frame in iter_sampled_frames(cap, sample_interval, start_time, end_time):
+        small_frame = downscale_region(frame, region, signal_width)
+        signal = scene_metric.prepare(small_frame)
+        event = None
+        if prev_signal is not None:
+            score = scene_metric.distance(prev_signal, signal)
+            if score > change_threshold:
+                event = CutEvent(frame_index, timestamp, score, frame)
+        prev_signal = signal
+        if transitions is None:
+            if event is not None:
+                yield event
+            continue
+        transition_score = transitions.update(small_frame)
+        if event is not None:
+            transitions.suppress()
+            if pending is not None:
+                event = event._replace(score=max(event.score, pending.score))
+            pending = event
+            continue
+        if pending is not None:
+            yield pending
+            pending = None
+        elif transition_score is not None:
+            yield CutEvent(frame_index, timestamp, transition_score, frame)
+    if pending is not None:
+        yield pending
+
+def detect_scene_changes(cap, change_threshold=0.36, metric="changed_pixels", sample_interval=1.0, signal_width=SIGNAL_WIDTH, start_time=0.0, end_time=None, transition_window=0, region=None):
+    """Collect iter_scene_changes into a list of CutEvents."""
+    return list(iter_scene_changes(cap, change_threshold, metric, sample_interval, signal_width, start_time, end_time, transition_window, region))
+
+def split_into_shards(frame_count, fps, sample_interval, shard_count, overlap=1):
+    """Split a video into shard_count contiguous ranges on the sampling grid.
+
+    Returns (start_time, end_time, first_frame_index, stop_frame_index) per shard. Each range except
+    the first starts overlap samples early so its worker can warm up on frames the previous shard
+    owns, and runs overlap - 1 samples past its end so events held back at the boundary are seen.
+    Only events from first_frame_index up to stop_frame_index belong to the shard. The last range is
+    left open-ended in case the frame count is an estimate.
+    """
+    step = max(sample_interval, 1.0 / fps)
+    sample_count = max(1, int(math.ceil(frame_count / (step * fps))))
+    shard_count = max(1, min(shard_count, sample_count))
+    bounds = [sample_count * i // shard_count for i in range(shard_count + 1)]
+    shards = []
+    for i in range(shard_count):
+        start_sample = max(bounds[i] - overlap, 0)
+        if i < shard_count - 1:
+            end_time = (bounds[i + 1] + overlap - 1) * step
+            stop_frame_index = sample_frame_index(bounds[i + 1], step, fps)
+        else:
+            end_time = stop_frame_index = None
+        shards.append((start_sample * step, end_time, sample_frame_index(bounds[i], step, fps), stop_frame_index))
+    return shards
+
+def _detect_shard(video_path, start_time, end_time, first_frame_index, stop_frame_index, change_threshold, metric, sample_interval, signal_width, transition_window, region, open_source):
+    """Process pool worker: detect scene changes in one time range of a separately opened capture.
+
+    Frames are dropped before returning so only small events are sent back to the parent process.
+    """
+    cv2.setNumThreads(1)
+    cap = open_source(video_path) if open_source is not None else cv2.VideoCapture(video_path)
+    try:
+        return [event._replace(frame=None) for event in
+                iter_scene_changes(cap, change_threshold, metric, sample_interval, signal_width, start_time, end_time, transition_window, region)
+                if event.frame_index >= first_frame_index and (stop_frame_index is None or event.frame_index < stop_frame_index)]
+    finally:
+        cap.release()
+
+def _iter_source_scene_changes(video_path, open_source, change_threshold, metric, sample_interval, signal_width, transition_window, region):
+    """iter_scene_changes on open_source(video_path), keeping its frames when they are full-size BGR and reading the others back with OpenCV."""
+    source = open_source(video_path)
+    width = int(source.get(cv2.CAP_PROP_FRAME_WIDTH))
+    cap = None
+    try:
+        for event in iter_scene_changes(source, change_threshold, metric, sample_interval, signal_width, transition_window=transition_window, region=region):
+            if event.frame.ndim == 3 and event.frame.shape[1] == width:
+                yield event
+                continue
+            if cap is None:
+                cap = cv2.VideoCapture(video_path)
+                fps = get_video_fps(cap)
+            frame = read_frame_at(cap, int(round(event.timestamp * fps)))
+            yield event._replace(frame=frame)
+    finally:
+        source.release()
+        if cap is not None:
+            cap.release()
+
+def iter_scene_changes_parallel(video_path, workers=None, change_threshold=0.36, metric="changed_pixels", sample_interval=1.0, signal_width=SIGNAL_WIDTH, transition_window=0, region=None,
+                                open_source=None):
+    """Detect scene changes by splitting the video into time shards processed in a process pool.
+
+    Every worker opens its own cv2.VideoCapture and seeks to the start of its shard. Shards share the
+    sampling grid and overlap by one sample, or by enough samples to cover the transition detector
+    window, so the merged events match iter_scene_changes on the whole file. With transitions on, a
+    gradual change longer than the overlap that straddles a shard boundary can still be split.
+    Events are yielded in order, and the frame for each one is read back here by seeking, so only
+    one full-resolution frame is held at a time. metric must be a registered metric name so it can
+    be sent to the workers.
+
+    open_source(video_path), e.g. from video_source.video_source_factory or MediaReader.open_video,
+    picks the decode backend used for analysis. With one worker the file is then not opened with
+    OpenCV at all while the source hands out full-size BGR frames; small or gray frames are read back
+    from the file for the events only.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 and open_source is not None:
+        yield from _iter_source_scene_changes(video_path, open_source, change_threshold, metric, sample_interval, signal_width, transition_window, region)
+        return
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Failed to open video: {video_path}")
+        return
+    try:
+        fps = get_video_fps(cap)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if workers == 1 or frame_count <= 0:
+            if open_source is None:
+                yield from iter_scene_changes(cap, change_threshold, metric, sample_interval, signal_width, transition_window=transition_window, region=region)
+            else:
+                yield from _iter_source_scene_changes(video_path, open_source, change_threshold, metric, sample_interval, signal_width,
+                                                      transition_window, region)
+            return
+
+        overlap = 2 * transition_window + 1 if transition_window else 1
+        shards = split_into_shards(frame_count, fps, sample_interval, workers, overlap)
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(_detect_shard, video_path, start_time, end_time, first_frame_index, stop_frame_index, change_threshold,
+                                       metric, sample_interval, signal_width, transition_window, region, open_source)
+                       for start_time, end_time, first_frame_index, stop_frame_index in shards]
+            for future in futures:
+                for event in future.result():
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, event.frame_index)
+                    ret, frame = cap.read()
+                    if ret:
+                        yield event._replace(frame=frame)
+    finally:
+        cap.release()
+
+def detect_scene_changes_parallel(video_path, workers=None, change_threshold=0.36, metric="changed_pixels", sample_interval=1.0, signal_width=SIGNAL_WIDTH, transition_window=0, region=None,
+                                  open_source=None):
+    """Collect iter_scene_changes_parallel into a list of CutEvents."""
+    return list(iter_scene_changes_parallel(video_path, workers, change_threshold, metric, sample_interval, signal_width, transition_window, region, open_source))
+
+def _new_stage_stats(queue_size):
+    return {"items": 0, "busy_seconds": 0.0, "wait_seconds": 0.0, "queue_size": queue_size, "max_queue_fill": 0}
+
+def _put(stage_queue, item, stop_event, stats):
+    """Put an item on a bounded queue, counting the time spent blocked and giving up if the pipeline stops."""
+    start = time.perf_counter()
+    while not stop_event.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            continue
+    stats["wait_seconds"] += time.perf_counter() - start
+    stats["max_queue_fill"] = max(stats["max_queue_fill"], stage_queue.qsize())
+
+def _get(stage_queue, stop_event, stats):
+    """Take an item from a bounded queue, counting the time spent waiting. Returns None once the pipeline stops."""
+    start = time.perf_counter()
+    item = None
+    while not stop_event.is_set():
+        try:
+            item = stage_queue.get(timeout=0.1)
+            break
+        except queue.Empty:
+            continue
+    stats["wait_seconds"] += time.perf_counter() - start
+    return item
+
+def run_detection_pipeline(video_path, save_scene, change_threshold=0.36, metric="changed_pixels", sample_interval=1.0,
+                           signal_width=SIGNAL_WIDTH, decode_queue_size=8, write_queue_size=8):
+    """Detect and save scenes with decoding, analysis and writing running on separate threads.
+
+    A decoder thread pushes sampled frames into a bounded queue, the analyzer scores them and pushes
+    CutEvents into a second bounded queue, and a writer thread calls save_scene(scene_index, event)
+    for each one, typically to encode the scene JPEG. OpenCV releases the GIL while decoding, resizing
+    and encoding, so the stages overlap instead of waiting on each other.
+
+    Returns a dict of per-stage counters: items handled, busy and wait seconds, queue size and the
+    fullest the stage's output queue got. The stage with the least wait time is the bottleneck.
+    """
+    scene_metric = get_metric(metric)
+    decode_queue = queue.Queue(maxsize=decode_queue_size)
+    write_queue = queue.Queue(maxsize=write_queue_size)
+    stop_event = threading.Event()
+    errors = []
+    stats = {
+        "decoder": _new_stage_stats(decode_queue_size),
+        "analyzer": _new_stage_stats(write_queue_size),
+        "writer": _new_stage_stats(0),
+    }
+
+    def decoder():
+        cap = cv2.VideoCapture(video_path)
+        try:
+            samples = iter_sampled_frames(cap, sample_interval)
+            while True:
+                start = time.perf_counter()
+                sample = next(samples, None)
+                stats["decoder"]["busy_seconds"] += time.perf_counter() - start
+                if sample is None:
+                    break
+                stats["decoder"]["items"] += 1
+                _put(decode_queue, sample, stop_event, stats["decoder"])
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            cap.release()
+            _put(decode_queue, None, stop_event, stats["decoder"])
+
+    def analyzer():
+        prev_signal = None
+        try:
+            while True:
+                sample = _get(decode_queue, stop_event, stats["analyzer"])
+                if sample is None:
+                    break
+                start = time.perf_counter()
+                frame_index, timestamp, frame = sample
+                signal = scene_metric.prepare(downscale_frame(frame, signal_width))
+                event = None
+                if prev_signal is not None:
+                    score = scene_metric.distance(prev_signal, signal)
+                    if score > change_threshold:
+                        event = CutEvent(frame_index, timestamp, score, frame)
+                prev_signal = signal
+                stats["analyzer"]["busy_seconds"] += time.perf_counter() - start
+                stats["analyzer"]["items"] += 1
+                if event is not None:
+                    _put(write_queue, event, stop_event, stats["analyzer"])
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            _put(write_queue, None, stop_event, stats["analyzer"])
+
+    def writer():
+        scene_index = 0
+        try:
+            while True:
+                event = _get(write_queue, stop_event, stats["writer"])
+                if event is None:
+                    break
+                start = time.perf_counter()
+                save_scene(scene_index, event)
+                stats["writer"]["busy_seconds"] += time.perf_counter() - start
+                stats["writer"]["items"] += 1
+                scene_index += 1
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    threads = [threading.Thread(target=stage, name=f"scene-{stage.__name__}", daemon=True) for stage in (decoder, analyzer, writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return stats
+
+def print_pipeline_stats(stats):
+    """Print the per-stage counters returned by run_detection_pipeline."""
+    for stage, counters in stats.items():
+        print(f"{stage:<9} items={counters['items']:<6} busy={counters['busy_seconds']:.2f}s "
+              f"wait={counters['wait_seconds']:.2f}s queue={counters['max_queue_fill']}/{counters['queue_size']}")
+
+def _require_av():
+    if av is None:
+        raise ImportError("This mode needs PyAV. Install it with: pip install av")
+
+def iter_keyframes(video_path):
+    """Yield (frame_index, timestamp, frame) for the I-frames of a video only.
+
+    Packets are still demuxed, but the decoder is told to skip every non-key frame, so the cost is a
+    small fraction of a full decode.
+    """
+    _require_av()
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = "NONKEY"
+        stream.thread_type = "AUTO"
+        fps = float(stream.average_rate or 30)
+        for frame in container.decode(stream):
+            if frame.pts is None:
+                continue
+            timestamp = float(frame.pts * stream.time_base)
+            yield int(round(timestamp * fps)), timestamp, frame.to_ndarray(format="bgr24")
+
+def refine_cut_in_window(video_path, start_time, end_time, metric="changed_pixels", signal_width=SIGNAL_WIDTH):
+    """Decode every frame between start_time and end_time and return the CutEvent with the largest change.
+
+    Used after a keyframe pass, where a cut is only known to lie somewhere between two keyframes.
+    """
+    _require_av()
+    scene_metric = get_metric(metric)
+    best = None
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        fps = float(stream.average_rate or 30)
+        container.seek(int(start_time / stream.time_base), stream=stream, backward=True)
+        prev_signal = None
+        for frame in container.decode(stream):
+            if frame.pts is None:
+                continue
+            timestamp = float(frame.pts * stream.time_base)
+            if timestamp < start_time - 1e-6:
+                continue
+            if timestamp > end_time + 1e-6:
+                break
+            image = frame.to_ndarray(format="bgr24")
+            signal = scene_metric.prepare(downscale_frame(image, signal_width))
+            if prev_signal is not None:
+                score = scene_metric.distance(prev_signal, signal)
+                if best is None or score > best.score:
+                    best = CutEvent(int(round(timestamp * fps)), timestamp, score, image)
+            prev_signal = signal
+    return best
+
+def iter_keyframe_scene_changes(video_path, change_threshold=0.36, metric="changed_pixels", signal_width=SIGNAL_WIDTH, refine=False):
+    """Fast first pass: compare consecutive I-frames and yield a CutEvent where they differ.
+
+    Cut positions are only as precise as the keyframe spacing. With refine=True the window between
+    the two keyframes is decoded in full and the event points at the exact frame where the cut is.
+    """
+    scene_metric = get_metric(metric)
+    prev_signal = None
+    prev_timestamp = None
+    for frame_index, timestamp, frame in iter_keyframes(video_path):
+        signal = scene_metric.prepare(downscale_frame(frame, signal_width))
+        if prev_signal is not None:
+            score = scene_metric.distance(prev_signal, signal)
+            if score > change_threshold:
+                event = CutEvent(frame_index, timestamp, score, frame)
+                if refine:
+                    event = refine_cut_in_window(video_path, prev_timestamp, timestamp, metric, signal_width) or event
+                yield event
+        prev_signal = signal
+        prev_timestamp = timestamp
+
+def read_frame_at(cap, frame_index):
+    """Seek to frame_index and decode that frame. Returns None past the end of the video."""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    ret, frame = cap.read()
+    return frame if ret else None
+
+def refine_cut(cap, event, search_start, metric="changed_pixels", signal_width=SIGNAL_WIDTH):
+    """Bisect between search_start and a coarse cut to find the first frame of the new shot.
+
+    search_start must be a frame from the old shot, usually the sample before the cut. Each step seeks
+    to the middle frame and keeps the half whose ends look different, so a 30-frame gap needs about
+    log2(30) = 5 decodes. Returns a CutEvent for the boundary frame, scored against the frame before it.
+    """
+    scene_metric = get_metric(metric)
+    lo, hi = search_start, event.frame_index
+    lo_frame = read_frame_at(cap, lo)
+    if lo_frame is None or hi - lo <= 1:
+        return event
+    lo_signal = scene_metric.prepare(downscale_frame(lo_frame, signal_width))
+    hi_signal = scene_metric.prepare(downscale_frame(event.frame, signal_width))
+    hi_frame = event.frame
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        frame = read_frame_at(cap, mid)
+        if frame is None:
+            break
+        signal = scene_metric.prepare(downscale_frame(frame, signal_width))
+        if scene_metric.distance(lo_signal, signal) > scene_metric.distance(signal, hi_signal):
+            hi, hi_signal, hi_frame = mid, signal, frame
+        else:
+            lo, lo_signal = mid, signal
+    return CutEvent(hi, hi / get_video_fps(cap), scene_metric.distance(lo_signal, hi_signal), hi_frame)
+
+def refine_scene_changes(video_path, scene_changes, sample_interval=1.0, metric="changed_pixels", signal_width=SIGNAL_WIDTH):
+    """Refine a stream of coarse CutEvents to frame accuracy with refine_cut.
+
+    Works on the output of any of the sampled detectors; the capture used for seeking is opened here.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = get_video_fps(cap)
+        gap = int(math.ceil(max(sample_interval, 1.0 / fps) * fps))
+        for event in scene_changes:
+            yield refine_cut(cap, event, max(event.frame_index - gap, 0), metric, signal_width)
+    finally:
+        cap.release()
+
+def attach_frames(video_path, scene_changes):
+    """Fill in the full-resolution frame of CutEvents that only carry a frame index, by seeking to each one."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        for event in scene_changes:
+            if event.frame is None:
+                frame = read_frame_at(cap, event.frame_index)
+                if frame is None:
+                    continue
+                event = event._replace(frame=frame)
+            yield event
+    finally:
+        cap.release()
+
+def attach_frames_from(frame_source, scene_changes):
+    """Swap the frames of CutEvents for the frames at the same timestamps in another rendition of the video.
+
+    Lets cuts be found on a small analysis rendition while the saved scenes come from the HD one.
+    frame_source is a file path or any URL FFmpeg can open; over HTTP it seeks with range requests,
+    so only the bytes around each cut are downloaded. Events are kept with their original frame
+    when the source cannot provide one, and how many were is printed at the end.
+    """
+    cap = cv2.VideoCapture(frame_source)
+    if not cap.isOpened():
+        print(f"Failed to open frame source {frame_source}, keeping analysis frames")
+        yield from scene_changes
+        return
+    kept = total = 0
+    try:
+        fps = get_video_fps(cap)
+        for event in scene_changes:
+            frame = read_frame_at(cap, int(round(event.timestamp * fps)))
+            total += 1
+            if frame is None:
+                kept += 1
+                yield event
+            else:
+                yield event._replace(frame=frame)
+    finally:
+        cap.release()
+    if kept:
+        print(f"Frame source could not provide {kept} of {total} scene frames; kept the analysis frames for those")
+
+def video_fingerprint(video_path, block_size=65536, block_count=16):
+    """Fast content fingerprint of a file: its size plus a hash of block_count evenly spaced blocks.
+
+    Reads about 1 MB regardless of the file size, and does not depend on the file name or mtime,
+    so a copied or renamed video still matches.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(video_path, "rb") as f:
+        if size <= block_size * block_count:
+            digest.update(f.read())
+        else:
+            for i in range(block_count):
+                f.seek((size - block_size) * i // (block_count - 1))
+                digest.update(f.read(block_size))
+    return f"{size:x}-{digest.hexdigest()}"
+
+def _times_path(samples_path):
+    return os.path.splitext(samples_path)[0] + "_times.npy"
+
+def _params_path(samples_path):
+    return os.path.splitext(samples_path)[0] + "_params.json"
+
+def record_frame_samples(video_path, samples_path, sample_interval=1.0, signal_width=SIGNAL_WIDTH, region=None, settings=None):
+    """Decode a video once and save its downscaled samples to samples_path as a .npy file.
+
+    The samples are kept in colour (about 7 KB each at the default width) so every metric can be
+    computed from them later. Frame indices and timestamps go to a matching *_times.npy file, and the
+    video_fingerprint, sample_interval, signal_width and settings (the options that chose the interval
+    and region) to a *_params.json file that frame_samples_params checks. Returns the number of
+    samples written.
+    """
+    cap = cv2.VideoCapture(video_path)
+    samples = []
+    times = []
+    try:
+        for frame_index, timestamp, frame in iter_sampled_frames(cap, sample_interval):
+            samples.append(downscale_region(frame, region, signal_width))
+            times.append((frame_index, timestamp))
+    finally:
+        cap.release()
+    if not samples:
+        return 0
+    np.save(samples_path, np.stack(samples))
+    np.save(_times_path(samples_path), np.array(times, dtype=np.float64))
+    params = dict(settings or {}, video=video_fingerprint(video_path), sample_interval=sample_interval, signal_width=signal_width)
+    with open(_params_path(samples_path), "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return len(samples)
+
+def frame_samples_params(samples_path, video_path, sample_interval=None, signal_width=SIGNAL_WIDTH, **settings):
+    """Parameters samples_path was recorded with, or None if it has to be recorded again.
+
+    A recording is stale when any of its files is missing, or it was made from a different video (by
+    video_fingerprint), at a different sample_interval (None accepts any) or signal_width, or with
+    different settings.
+    """
+    if not (os.path.exists(samples_path) and os.path.exists(_times_path(samples_path))):
+        return None
+    try:
+        with open(_params_path(samples_path), "r", encoding="utf-8") as f:
+            params = json.load(f)
+    except (OSError, ValueError):
+        return None
+    expected = dict(settings, video=video_fingerprint(video_path), signal_width=signal_width)
+    if sample_interval is not None:
+        expected["sample_interval"] = sample_interval
+    if any(params.get(name) != value for name, value in expected.items()):
+        return None
+    return params
+
+def load_frame_samples(samples_path):
+    """Open recorded samples as a read-only memmap. Returns (times, samples) where times is an (N, 2) array of frame index and timestamp."""
+    return np.load(_times_path(samples_path)), np.load(samples_path, mmap_mode="r")
+
+def sample_scores(samples, metric="changed_pixels"):
+    """Score every consecutive pair of recorded samples; element i compares sample i with sample i + 1.
+
+    The luma metrics run as one vectorized pass over the whole array, the others pair by pair.
+    """
+    scene_metric = get_metric(metric)
+    if len(samples) < 2:
+        return np.zeros(0, dtype=np.float64)
+    if scene_metric.distance in (mean_absolute_difference, changed_pixel_ratio):
+        luma = samples[..., 0] * 0.114 + samples[..., 1] * 0.587 + samples[..., 2] * 0.299
+        luma = np.rint(luma).astype(np.int16)
+        diffs = np.abs(np.diff(luma, axis=0)).reshape(len(samples) - 1, -1)
+        if scene_metric.distance is mean_absolute_difference:
+            return diffs.mean(axis=1) / 255.0
+        return (diffs > 12).mean(axis=1)
+    signals = [scene_metric.prepare(np.asarray(sample)) for sample in samples]
+    return np.array([scene_metric.distance(a, b) for a, b in zip(signals, signals[1:])], dtype=np.float64)
+
+def detect_from_frame_samples(samples_path, change_threshold=0.36, metric="changed_pixels"):
+    """Detect scene changes from recorded samples without opening the video.
+
+    Returns CutEvents with frame set to None; pass them through attach_frames to read the frames.
+    """
+    times, samples = load_frame_samples(samples_path)
+    scores = sample_scores(samples, metric)
+    cut_positions = np.flatnonzero(scores > change_threshold) + 1
+    return [CutEvent(int(times[i, 0]), float(times[i, 1]), float(scores[i - 1]), None) for i in cut_positions]
+
+def compute_scores(video_path, metric="changed_pixels", sample_interval=1.0, signal_width=SIGNAL_WIDTH, region=None):
+    """Decode a video once and return (times, scores) for calibration.
+
+    times is an (N, 2) array of frame index and timestamp per sample, scores has N - 1 entries where
+    scores[i] compares sample i with sample i + 1.
+    """
+    scene_metric = get_metric(metric)
+    cap = cv2.VideoCapture(video_path)
+    times = []
+    scores = []
+    prev_signal = None
+    try:
+        for frame_index, timestamp, frame in iter_sampled_frames(cap, sample_interval):
+            signal = scene_metric.prepare(downscale_region(frame, region, signal_width))
+            if prev_signal is not None:
+                scores.append(scene_metric.distance(prev_signal, signal))
+            times.append((frame_index, timestamp))
+            prev_signal = signal
+    finally:
+        cap.release()
+    return np.array(times, dtype=np.float64).reshape(-1, 2), np.array(scores, dtype=np.float64)
+
+def threshold_curve(scores, thresholds=None):
+    """Number of cuts each threshold would give, for a whole grid of thresholds in one pass."""
+    if thresholds is None:
+        thresholds = np.linspace(0.0, 1.0, 101)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    sorted_scores = np.sort(np.asarray(scores, dtype=np.float64))
+    counts = len(sorted_scores) - np.searchsorted(sorted_scores, thresholds, side="right")
+    return thresholds, counts
+
+def pick_threshold(scores, duration, target_scenes_per_minute=2.0, thresholds=None):
+    """Pick the threshold whose cut count is closest to target_scenes_per_minute over duration seconds.
+
+    When a range of thresholds gives the same count, the middle of the range is used so the choice is
+    not sitting right on one of the scores.
+    """
+    thresholds, counts = threshold_curve(scores, thresholds)
+    errors = np.abs(counts - target_scenes_per_minute * duration / 60.0)
+    best = np.flatnonzero(errors == errors.min())
+    return float(thresholds[best[len(best) // 2]])
+
+def adaptive_cut_positions(scores, window=6, ratio=3.0, min_score=0.05, quantile=0.25):
+    """Indices of scores that stand out from the window samples on either side of them.
+
+    A score counts as a cut when it is above min_score and at least ratio times the lower quantile
+    of its neighbours, so steady motion raises the bar locally while a quiet shot keeps it low. A low
+    quantile rather than the mean keeps the baseline down when other cuts fall inside the window, so
+    fast cutting (a cut every sample or two) is still found. All windows are ranked in one
+    vectorized pass.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.intp)
+    windows = np.lib.stride_tricks.sliding_window_view(np.pad(scores, window, mode="edge"), 2 * window + 1)
+    neighbours = np.delete(windows, window, axis=1)  # Everything in the window but the score itself
+    baseline = np.quantile(neighbours, quantile, axis=1)
+    return np.flatnonzero((scores > min_score) & (scores >= ratio * baseline))
+
+def print_threshold_curve(thresholds, counts, duration, chosen=None, step=5):
+    """Print the scene-count curve, every step-th threshold, marking the chosen one."""
+    minutes = max(duration / 60.0, 1e-9)
+    for threshold, count in list(zip(thresholds, counts))[::step]:
+        marker = " <" if chosen is not None and abs(threshold - chosen) < (thresholds[1] - thresholds[0]) * step / 2 else ""
+        print(f"threshold {threshold:.2f}: {count:5d} scenes ({count / minutes:.1f}/min){marker}")
+
+def auto_scene_changes(times, scores, target_scenes_per_minute=None, window=6, ratio=3.0):
+    """Pick cuts for one video from its score signal, without a hand-tuned threshold.
+
+    With target_scenes_per_minute a single threshold is chosen to match that rate; otherwise the
+    adaptive local-statistics rule is used. Prints the scene-count curve and returns CutEvents with
+    frame set to None.
+    """
+    duration = float(times[-1, 1] - times[0, 1]) if len(times) else 0.0
+    thresholds, counts = threshold_curve(scores)
+    if target_scenes_per_minute is not None:
+        chosen = pick_threshold(scores, duration, target_scenes_per_minute)
+        positions = np.flatnonzero(scores > chosen)
+        print(f"Calibrated threshold {chosen:.2f} for {target_scenes_per_minute} scenes per minute")
+    else:
+        chosen = None
+        positions = adaptive_cut_positions(scores, window, ratio)
+        print(f"Adaptive threshold found {len(positions)} scenes")
+    print_threshold_curve(thresholds, counts, duration, chosen)
+    return [CutEvent(int(times[i + 1, 0]), float(times[i + 1, 1]), float(scores[i]), None) for i in positions]
+
+def iter_video_scene_changes(video_path, change_threshold=0.36, metric="changed_pixels", sample_interval=None, frame_check_interval=30, workers=1,
+                             keyframes_only=False, refine=False, cache=None, samples_path=None, target_scenes_per_minute=None, transition_window=0,
+                             auto_region=False, roi=None, decode_options=None, open_source=None):
+    """Detect the cuts of a video file with the chosen strategy, through a SceneCache when one is given.
+
+    This is the one place the scripts pick a detector from their settings:
+    - keyframes_only compares I-frames only, a rough first pass;
+    - otherwise frames are sampled every sample_interval seconds (every frame_check_interval frames
+      by default) on workers processes, within the area auto_region or roi=(x, y, w, h) picks;
+    - change_threshold="auto" calibrates the threshold from this video's own scores, aiming at
+      target_scenes_per_minute when given;
+    - samples_path records the downscaled samples once, so later runs re-tune without decoding; a
+      recording from another video or with other settings is made again;
+    - decode_options (see video_source.video_source_factory) or an open_source callable picks the
+      decoder used for analysis;
+    - refine bisects each cut down to the first frame of the new shot.
+    The cache key is built from every setting that changes the cuts, and is checked before the video
+    is opened, so a hit decodes nothing.
+    """
+    scene_changes = _detect_video_scene_changes(video_path, change_threshold, metric, sample_interval, frame_check_interval, workers, keyframes_only,
+                                                refine, samples_path, target_scenes_per_minute, transition_window, auto_region, roi, decode_options,
+                                                open_source)
+    if cache is not None:
+        # Reuse the cuts from an earlier run on the same video with the same settings
+        scene_changes = cache.wrap(video_path, scene_changes, change_threshold=change_threshold, sample_interval=sample_interval,
+                                   frame_check_interval=frame_check_interval, metric=metric, keyframes_only=keyframes_only, refine=refine,
+                                   target_scenes_per_minute=target_scenes_per_minute, transition_window=transition_window, auto_region=auto_region,
+                                   roi=roi, decode_options=decode_options)
+    yield from scene_changes
+
+def _detect_video_scene_changes(video_path, change_threshold, metric, sample_interval, frame_check_interval, workers, keyframes_only, refine,
+                                samples_path, target_scenes_per_minute, transition_window, auto_region, roi, decode_options, open_source):
+    # A generator, so none of the pre-passes below run until the scene cache misses
+    if keyframes_only:
+        scene_changes = iter_keyframe_scene_changes(video_path, change_threshold, metric, refine=refine)
+    else:
+        recorded = None
+        if samples_path is not None:
+            # What picks the interval and region; samples of another video or made with other settings are recorded again
+            settings = {"frame_check_interval": frame_check_interval if sample_interval is None else None, "auto_region": bool(auto_region),
+                        "roi": None if roi is None else [int(v) for v in roi]}
+            recorded = frame_samples_params(samples_path, video_path, sample_interval, **settings)
+            if recorded is not None:
+                sample_interval = recorded["sample_interval"]
+        if sample_interval is None:
+            cap = cv2.VideoCapture(video_path)
+            sample_interval = frames_to_seconds(frame_check_interval, get_video_fps(cap))
+            cap.release()
+        region = None
+        if recorded is None and (auto_region or roi is not None):
+            # Ignore letterbox bars and static logos or tickers
+            region = analyze_frame_region(video_path, manual_roi=roi)
+        if samples_path is not None and recorded is None:
+            record_frame_samples(video_path, samples_path, sample_interval, region=region, settings=settings)
+        if change_threshold == "auto":
+            # Compute the score signal once and calibrate this video's threshold from it
+            if samples_path is not None:
+                times, samples = load_frame_samples(samples_path)
+                scores = sample_scores(samples, metric)
+            else:
+                times, scores = compute_scores(video_path, metric, sample_interval, region=region)
+            scene_changes = attach_frames(video_path, auto_scene_changes(times, scores, target_scenes_per_minute))
+        elif samples_path is not None:
+            scene_changes = attach_frames(video_path, detect_from_frame_samples(samples_path, change_threshold, metric))
+        else:
+            if open_source is None and decode_options:
+                open_source = video_source_factory(**decode_options)
+            # transition_window > 0 also reports fades and dissolves, once each
+            scene_changes = iter_scene_changes_parallel(video_path, workers, change_threshold, metric, sample_interval, transition_window=transition_window,
+                                                        region=region, open_source=open_source)
+        if refine:
+            scene_changes = refine_scene_changes(video_path, scene_changes, sample_interval, metric)
+    yield from scene_changes
@@ -0,0 +1,193 @@
+import cv2
+import os
+import shutil
+import numpy as np
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+_turbojpeg = None
+
+def get_turbojpeg():
+    """Return a shared TurboJPEG encoder, or None when PyTurboJPEG or libjpeg-turbo is not installed."""
+    global _turbojpeg
+    if _turbojpeg is None and TurboJPEG is not None:
+        try:
+            _turbojpeg = TurboJPEG()
+        except (OSError, RuntimeError):
+            return None
+    return _turbojpeg
+
+def encode_jpeg(frame, quality=90, use_turbojpeg=True):
+    """Encode a BGR frame to JPEG bytes, through libjpeg-turbo when it is available."""
+    turbojpeg = get_turbojpeg() if use_turbojpeg else None
+    if turbojpeg is not None:
+        return turbojpeg.encode(frame, quality=quality)
+    success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+def make_thumbnail(frame, size=(320, 180)):
+    """Fit a frame into a fixed (width, height) cell, keeping the aspect ratio and padding with black."""
+    width, height = size
+    scale = min(width / float(frame.shape[1]), height / float(frame.shape[0]))
+    resized_width = max(1, int(round(frame.shape[1] * scale)))
+    resized_height = max(1, int(round(frame.shape[0] * scale)))
+    resized = cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_AREA)
+    if resized.ndim == 2:
+        resized = cv2.cvtColor(resized, cv2.COLOR_GRAY2BGR)
+    thumbnail = np.zeros((height, width, 3), dtype=np.uint8)
+    top = (height - resized_height) // 2
+    left = (width - resized_width) // 2
+    thumbnail[top:top + resized_height, left:left + resized_width] = resized
+    return thumbnail
+
+class StoryboardWriter:
+    """Compose storyboard pages from scene thumbnails as the scenes arrive.
+
+    Each scene is shrunk to thumbnail_size when it is added and copied into the current page. When the
+    rows x cols grid is full the page is written as storyboard_001.jpg, storyboard_002.jpg, ... and
+    the canvas is reused, so memory stays at one page however many scenes a video has.
+    """
+
+    def __init__(self, storyboard_folder, rows=5, cols=4, thumbnail_size=(320, 180), quality=90, prefix="storyboard"):
+        self.storyboard_folder = storyboard_folder
+        self.rows = rows
+        self.cols = cols
+        self.thumbnail_size = thumbnail_size
+        self.quality = quality
+        self.prefix = prefix
+        self.page = np.zeros((thumbnail_size[1] * rows, thumbnail_size[0] * cols, 3), dtype=np.uint8)
+        self.cells_used = 0
+        self.page_paths = []
+        os.makedirs(storyboard_folder, exist_ok=True)
+
+    def add(self, frame):
+        """Place a scene in the next free cell, writing the page out once it is full."""
+        if frame is None or frame.size == 0:
+            return
+        width, height = self.thumbnail_size
+        row, col = divmod(self.cells_used, self.cols)
+        self.page[row * height:(row + 1) * height, col * width:(col + 1) * width] = make_thumbnail(frame, self.thumbnail_size)
+        self.cells_used += 1
+        if self.cells_used == self.rows * self.cols:
+            self._write_page()
+
+    def _write_page(self):
+        path = os.path.join(self.storyboard_folder, f"{self.prefix}_{len(self.page_paths) + 1:03d}.jpg")
+        with open(path, "wb") as f:
+            f.write(encode_jpeg(self.page, self.quality))
+        print(f"Storyboard page saved to '{path}'")
+        self.page_paths.append(path)
+        self.page[:] = 0
+        self.cells_used = 0
+
+    def close(self):
+        """Write the last, partly filled page and return the paths of all pages."""
+        if self.cells_used:
+            self._write_page()
+        return self.page_paths
+
+class SceneWriter:
+    """Save scene frames as JPEGs on a pool of encoder threads.
+
+    When a StoryboardWriter is given, each scene is added to it as a thumbnail on submit, so saved
+    scenes never have to be read back from disk. cv2.imencode and libjpeg-turbo release the GIL, so
+    the encoders run in parallel with each other and with decoding. At most max_pending frames wait to
+    be encoded at once.
+
+    With a FrameHashIndex, frames that look like a scene already saved (in this video or another one
+    sharing the index) are not encoded again: duplicate_mode="link" hardlinks the earlier JPEG under
+    the new name, falling back to a copy across file systems, and "skip" writes nothing.
+    """
+
+    def __init__(self, scene_folder, quality=90, workers=4, storyboard=None, use_turbojpeg=True, max_pending=None,
+                 hash_index=None, duplicate_mode="link"):
+        if duplicate_mode not in ("link", "skip"):
+            raise ValueError(f"Unknown duplicate mode '{duplicate_mode}'. Use 'link' or 'skip'")
+        self.scene_folder = scene_folder
+        self.quality = quality
+        self.storyboard = storyboard
+        self.use_turbojpeg = use_turbojpeg
+        self.hash_index = hash_index
+        self.duplicate_mode = duplicate_mode
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jpeg-encoder")
+        self.pending = threading.BoundedSemaphore(max_pending or workers * 2)
+        self.futures = []
+        os.makedirs(scene_folder, exist_ok=True)
+
+    def submit(self, frame, scene_index):
+        """Queue a frame to be written as scene_<scene_index>.jpg, blocking while too many are pending."""
+        if self.storyboard is not None:
+            self.storyboard.add(frame)
+        frame_hash = None
+        if self.hash_index is not None:
+            frame_hash = self.hash_index.hash(frame)
+            original = self.hash_index.find(frame_hash)
+            if original is not None:
+                future = Future()
+                future.set_result(self._reuse(original, scene_index))
+                self.futures.append(future)
+                return future
+        self.pending.acquire()
+        future = self.executor.submit(self._write, frame, scene_index, frame_hash)
+        future.add_done_callback(lambda f: self.pending.release())
+        self.futures.append(future)
+        return future
+
+    def _write(self, frame, scene_index, frame_hash=None):
+        filepath = os.path.join(self.scene_folder, f"scene_{scene_index}.jpg")
+        # Replacing the name rather than writing into it leaves another video's JPEG alone when a
+        # rerun finds this path hardlinked to it
+        temp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(encode_jpeg(frame, self.quality, self.use_turbojpeg))
+            os.replace(temp_path, filepath)
+        except (OSError, ValueError) as e:
+            print(f"Failed to save scene {scene_index} at {filepath}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        if frame_hash is not None:
+            # Indexed only once the file exists, so later duplicates can always link to it
+            self.hash_index.add(frame_hash, filepath)
+        print(f"Saved scene {scene_index} in {self.scene_folder}")
+        return filepath
+
+    def _reuse(self, original, scene_index):
+        """Stand in for encoding a near-duplicate scene by linking to, or skipping in favour of, the original JPEG."""
+        filepath = os.path.join(self.scene_folder, f"scene_{scene_index}.jpg")
+        if self.duplicate_mode == "skip" or os.path.abspath(original) == os.path.abspath(filepath):
+            print(f"Scene {scene_index} duplicates {original}, not saved again")
+            return original
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            try:
+                os.link(original, filepath)
+            except OSError:
+                shutil.copyfile(original, filepath)
+        except OSError as e:
+            print(f"Failed to link scene {scene_index} to {original}: {e}")
+            return None
+        print(f"Linked scene {scene_index} to duplicate {original}")
+        return filepath
+
+    def close(self):
+        """Wait for every pending encode, finish the storyboard and return the saved paths in scene order (None for failures)."""
+        self.executor.shutdown(wait=True)
+        if self.storyboard is not None:
+            self.storyboard.close()
+        return [future.result() for future in self.futures]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from collections import namedtuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "youtube_transcripts", "transcripts")
+
+TranscriptKey = namedtuple("TranscriptKey", ["namespace", "fingerprint", "duration_ms"])
+
+def audio_fingerprint(pcm, sample_rate, bands=33, slices=9, frame_seconds=0.064, low=300.0, high=3000.0):
+    """256-bit fingerprint of a stretch of 16-bit mono PCM that survives re-encoding, as 32 bytes.
+
+    Band energies between low and high Hz are averaged over slices equal stretches of time, and each
+    bit is the sign of how the energy difference between neighbouring bands changes from one stretch
+    to the next, as in the Philips (Haitsma-Kalker) audio fingerprint. Returns None for audio too
+    short to fill the slices.
+    """
+    frame_length = max(2, int(sample_rate * frame_seconds))
+    count = len(pcm) // frame_length
+    if count < 2 * slices:
+        return None
+    frames = pcm[:count * frame_length].reshape(count, frame_length).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_length).astype(np.float32), axis=1)) ** 2
+    edges = np.geomspace(low, high, bands + 1) * frame_length / sample_rate
+    bins = np.clip(edges.astype(np.int64), 1, power.shape[1] - 1)
+    energies = np.add.reduceat(power, bins[:-1], axis=1)[:, :bands]
+    stretches = np.add.reduceat(energies, np.linspace(0, count, slices, endpoint=False).astype(np.int64), axis=0)
+    log_energies = np.log(stretches + 1.0)
+    bits = np.diff(np.diff(log_energies, axis=1), axis=0) < 0
+    return np.packbits(bits).tobytes()
+
+class TranscriptCache:
+    """Persistent on-disk cache of segment transcripts, keyed by what the audio sounds like.
+
+    Each silence-bounded segment is stored as a small JSON file under a directory for the recognizer
+    and language (its cache_key), named after the segment's audio_fingerprint and length. A lookup
+    compares the fingerprint against every stored segment of about the same length with NumPy and accepts
+    one within max_distance bits, so a segment shared with another video, or the same audio re-encoded
+    by a re-upload, is served without calling the recognizer. hits, misses and seconds_saved count
+    lookups since the cache was opened. Least recently used entries are removed once the cache grows
+    past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=64 * 1024 * 1024, max_distance=48):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.size = None  # Bytes on disk as of the last eviction scan, plus what has been stored since
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, namespace, pcm, sample_rate):
+        """Cache key for a segment transcribed by the recognizer and language namespace names, or None if it is too short."""
+        fingerprint = audio_fingerprint(pcm, sample_rate)
+        if fingerprint is None:
+            return None
+        return TranscriptKey(re.sub(r"[^\w.-]", "_", namespace), fingerprint, int(round(1000.0 * len(pcm) / sample_rate)))
+
+    def _path(self, namespace, name):
+        return os.path.join(self.cache_dir, namespace, name)
+
+    def _index(self, namespace):
+        """(names, fingerprints, durations) of the entries stored under namespace, loaded from the file names on first use."""
+        index = self.indexes.get(namespace)
+        if index is None:
+            directory = os.path.join(self.cache_dir, namespace)
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".json")) if os.path.isdir(directory) else []
+            fingerprints = np.frombuffer(bytes.fromhex("".join(name[:64] for name in names)), dtype=np.uint8).reshape(-1, 32)
+            durations = np.array([int(name[65:-5]) for name in names], dtype=np.int64)
+            index = self.indexes[namespace] = (names, fingerprints, durations)
+        return index
+
+    def _find(self, key):
+        """Name of the closest stored entry for key, or None."""
+        with self.lock:
+            names, fingerprints, durations = self._index(key.namespace)
+        if not names:
+            return None
+        # Boundaries found in re-encoded audio can move by a frame or two
+        candidates = np.flatnonzero(np.abs(durations - key.duration_ms) <= 250 + key.duration_ms // 100)
+        if not len(candidates):
+            return None
+        probe = np.frombuffer(key.fingerprint, dtype=np.uint8)
+        distances = np.unpackbits(fingerprints[candidates] ^ probe, axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        return names[candidates[best]] if distances[best] <= self.max_distance else None
+
+    def get(self, key):
+        """Return the cached transcript for key, or None on a miss."""
+        name = self._find(key) if key is not None else None
+        text = None
+        if name is not None:
+            path = self._path(key.namespace, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = json.load(f)["text"]
+                os.utime(path)  # Mark as recently used
+            except (OSError, ValueError, KeyError):
+                text = None
+        with self.lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.seconds_saved += key.duration_ms / 1000.0
+        return text
+
+    def put(self, key, text):
+        """Store the transcript for key, then evict old entries if the cache is over its size cap."""
+        if key is None:
+            return
+        name = f"{key.fingerprint.hex()}-{key.duration_ms}.json"
+        os.makedirs(os.path.join(self.cache_dir, key.namespace), exist_ok=True)
+        path = self._path(key.namespace, name)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "duration": key.duration_ms / 1000.0, "text": text}, f)
+        os.replace(temp_path, path)
+        with self.lock:
+            names, fingerprints, durations = self._index(key.namespace)
+            if name not in names:
+                self.indexes[key.namespace] = (names + [name], np.vstack([fingerprints, np.frombuffer(key.fingerprint, dtype=np.uint8)]),
+                                               np.append(durations, key.duration_ms))
+            self.size = None if self.size is None else self.size + os.path.getsize(path)
+        # Only list the whole cache when it may have outgrown its cap
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for namespace in os.listdir(self.cache_dir):
+            directory = os.path.join(self.cache_dir, namespace)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    try:
+                        stat = os.stat(os.path.join(directory, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, namespace, name))
+        total = sum(size for _, size, _, _ in entries)
+        removed = []
+        for _, size, namespace, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(namespace, name))
+            except OSError:
+                continue
+            total -= size
+            removed.append((namespace, name))
+        with self.lock:
+            self.size = total
+            for namespace in {namespace for namespace, name in removed} & set(self.indexes):
+                gone = {name for removed_namespace, name in removed if removed_namespace == namespace}
+                names, fingerprints, durations = self.indexes[namespace]
+                keep = np.array([name not in gone for name in names], dtype=bool)
+                self.indexes[namespace] = ([name for name in names if name not in gone], fingerprints[keep], durations[keep])
+
+    def summary(self):
+        """One line of hit/miss statistics for the log."""
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return f"Transcript cache: {self.hits}/{lookups} segments reused ({rate:.0f}%), {self.seconds_saved:.0f}s of audio not re-sent"
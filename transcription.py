@@ -0,0 +1,435 @@
+import os
+import queue
+import subprocess
+import threading
+import time
+import zlib
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import speech_recognition as sr
+except ImportError:
+    sr = None
+
+try:
+    import av
+except ImportError:
+    av = None
+
+try:
+    import imageio_ffmpeg
+except ImportError:
+    imageio_ffmpeg = None
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+Segment = namedtuple("Segment", ["start", "end", "text", "error"], defaults=(None,))
+FrameFeatures = namedtuple("FrameFeatures", ["level", "zero_crossings", "flatness", "speech_band", "flux"])
+
+def _ffmpeg_executable():
+    """The ffmpeg binary moviepy installs through imageio-ffmpeg, or ffmpeg from the PATH."""
+    return imageio_ffmpeg.get_ffmpeg_exe() if imageio_ffmpeg is not None else "ffmpeg"
+
+def extract_pcm(video_path, sample_rate=16000):
+    """Decode a file's audio straight to 16-bit mono PCM at sample_rate in a NumPy array.
+
+    Nothing is written to disk. PyAV is used when it is installed; otherwise raw PCM is read from an
+    ffmpeg process through a pipe. An hour of audio takes about 115 MB at 16 kHz mono, against
+    635 MB for the 44.1 kHz stereo temp_audio.wav written before.
+    """
+    if av is not None:
+        chunks = []
+        with av.open(video_path) as container:
+            if container.streams.audio:
+                resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+                for frame in container.decode(container.streams.audio[0]):
+                    chunks.extend(resampled.to_ndarray().reshape(-1) for resampled in resampler.resample(frame))
+                chunks.extend(resampled.to_ndarray().reshape(-1) for resampled in resampler.resample(None))
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+    command = [_ffmpeg_executable(), "-nostdin", "-loglevel", "error", "-i", video_path, "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode the audio of {video_path}: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+def extract_audio_data(video_path, sample_rate=16000):
+    """sr.AudioData for a file's audio, built from extract_pcm without a temporary WAV file."""
+    if sr is None:
+        raise ImportError("Transcription needs SpeechRecognition. Install it with: pip install SpeechRecognition")
+    return sr.AudioData(extract_pcm(video_path, sample_rate).tobytes(), sample_rate, 2)
+
+def frame_energies(pcm, sample_rate, frame_seconds=0.03, block_frames=65536):
+    """RMS level of each frame_seconds frame of 16-bit mono PCM, as (energies, frame_length)."""
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    count = len(pcm) // frame_length
+    frames = pcm[:count * frame_length].reshape(count, frame_length)
+    energies = np.empty(count, dtype=np.float32)
+    # Converted a block at a time, so an hour of audio does not need a float copy of the whole signal
+    for start in range(0, count, block_frames):
+        block = frames[start:start + block_frames].astype(np.float32)
+        energies[start:start + block_frames] = np.sqrt(np.mean(block * block, axis=1))
+    return energies, frame_length
+
+def split_on_silence(pcm, sample_rate, max_segment_seconds=30.0, min_segment_seconds=5.0, frame_seconds=0.03, smoothing_seconds=0.3, silence_ratio=0.1):
+    """Split PCM into (start_sample, end_sample) segments no longer than max_segment_seconds.
+
+    Levels are averaged over smoothing_seconds first, so a single quiet frame in the middle of a word
+    does not count as a pause; a pause is a run below silence_ratio times the median level. Each cut
+    goes at the middle of the longest pause between min_segment_seconds and max_segment_seconds after
+    the previous one, or at the quietest point there if there is no pause. Pause lengths change little
+    when audio is re-encoded, so the cuts fall in the same places, and after a different intro they
+    soon fall back into step, which lets the transcript cache match segments across videos.
+    """
+    energies, frame_length = frame_energies(pcm, sample_rate, frame_seconds)
+    smoothing = max(1, int(smoothing_seconds / frame_seconds))
+    if len(energies) > smoothing:
+        energies = np.convolve(energies, np.ones(smoothing, dtype=np.float32) / smoothing, mode="same")
+    max_frames = max(1, int(max_segment_seconds / frame_seconds))
+    min_frames = min(max_frames - 1, int(min_segment_seconds / frame_seconds))
+    silent = energies < silence_ratio * np.median(energies) if len(energies) else np.zeros(0, dtype=bool)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    pauses = (edges[0::2] + edges[1::2]) // 2  # Middle frame of each pause
+    lengths = edges[1::2] - edges[0::2]
+    segments = []
+    start = 0
+    while len(energies) - start > max_frames:
+        first, end = np.searchsorted(pauses, [start + min_frames, start + max_frames])
+        if end > first:
+            # Longest pause in the window; the later one on a tie
+            cut = int(pauses[end - 1 - np.argmax(lengths[first:end][::-1])])
+        else:
+            cut = start + min_frames + int(np.argmin(energies[start + min_frames:start + max_frames]))
+        segments.append((start * frame_length, cut * frame_length))
+        start = cut
+    if start * frame_length < len(pcm):
+        segments.append((start * frame_length, len(pcm)))
+    return segments
+
+def frame_features(pcm, sample_rate, frame_seconds=0.03, block_frames=8192):
+    """Voice-activity features of each frame_seconds frame of 16-bit mono PCM, as (FrameFeatures, frame_length).
+
+    level is the RMS level in dBFS, zero_crossings the share of adjacent samples that change sign,
+    flatness the spectral flatness (near 0 for tones and voiced speech, about 0.5 for white noise),
+    speech_band the share of the spectrum's energy between 300 and 3400 Hz and flux how much the shape
+    of the spectrum changed since the previous frame (0 for a held note, 1 for no overlap at all).
+    Frames are processed block_frames at a time, with one FFT call per block.
+    """
+    frame_length = max(2, int(sample_rate * frame_seconds))
+    count = len(pcm) // frame_length
+    frames = pcm[:count * frame_length].reshape(count, frame_length)
+    window = np.hanning(frame_length).astype(np.float32)
+    frequencies = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    band = (frequencies >= 300) & (frequencies <= 3400)
+    features = FrameFeatures(*(np.empty(count, dtype=np.float32) for _ in FrameFeatures._fields))
+    previous = None
+    for start in range(0, count, block_frames):
+        block = frames[start:start + block_frames].astype(np.float32)
+        stop = start + len(block)
+        features.level[start:stop] = 10.0 * np.log10(np.mean(block * block, axis=1) / 32768.0 ** 2 + 1e-10)
+        signs = np.signbit(block)
+        features.zero_crossings[start:stop] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_length - 1)
+        power = np.abs(np.fft.rfft(block * window, axis=1)) ** 2 + 1e-3
+        features.flatness[start:stop] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        features.speech_band[start:stop] = power[:, band].sum(axis=1) / power.sum(axis=1)
+        # Cosine distance between the square-root magnitude spectra of neighbouring frames
+        shape = np.sqrt(np.sqrt(power))
+        shape /= np.linalg.norm(shape, axis=1, keepdims=True)
+        shifted = np.concatenate((shape[:1] if previous is None else previous, shape[:-1]))
+        features.flux[start:stop] = 1.0 - np.sum(shape * shifted, axis=1)
+        previous = shape[-1:]
+    return features, frame_length
+
+def _runs(mask):
+    """(starts, ends) of the runs of True in a boolean array."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
+def speech_regions(pcm, sample_rate, frame_seconds=0.03, min_level=-50.0, floor_margin=10.0, max_zero_crossings=0.25, max_flatness=0.3,
+                   min_speech_band=0.25, flux_seconds=0.5, min_flux=0.05, min_changing=0.4, min_speech_seconds=0.3, max_gap_seconds=1.5, padding_seconds=0.2):
+    """(start_sample, end_sample) regions of PCM that contain speech, for skipping silence, music and noise.
+
+    A frame counts as voiced when it is floor_margin dB above the quietest tenth of the audio (and
+    above min_level dBFS), has few zero crossings and a peaky spectrum with much of its energy in the
+    speech band. The formants of speech move from one syllable to the next while the notes of music
+    are held, so voiced frames also need min_changing of the frames within flux_seconds to have a
+    spectral flux above min_flux. A chord change is a single such frame, while speech over background
+    music still passes. Voiced stretches shorter than min_speech_seconds
+    are dropped and each region is padded by padding_seconds. Gaps up to max_gap_seconds are bridged,
+    which keeps unvoiced consonants, and pauses between sentences so a talk is not split into many
+    short requests.
+    """
+    features, frame_length = frame_features(pcm, sample_rate, frame_seconds)
+    if not len(features.level):
+        return []
+    threshold = max(min_level, min(np.percentile(features.level, 10) + floor_margin, -30.0))
+    voiced = ((features.level > threshold) & (features.zero_crossings < max_zero_crossings) &
+              (features.flatness < max_flatness) & (features.speech_band > min_speech_band))
+    width = max(1, int(flux_seconds / frame_seconds))
+    voiced &= np.convolve(features.flux > min_flux, np.ones(width, dtype=np.float32) / width, mode="same") >= min_changing
+    starts, ends = _runs(voiced)
+    if not len(starts):
+        return []
+    gaps = starts[1:] - ends[:-1]
+    keep = np.concatenate(([True], gaps > max_gap_seconds / frame_seconds))
+    # Merge runs separated by short gaps, then drop what is still too short to be speech
+    starts, ends = starts[keep], np.concatenate((ends[:-1][keep[1:]], ends[-1:]))
+    long_enough = ends - starts >= min_speech_seconds / frame_seconds
+    padding = int(padding_seconds / frame_seconds)
+    regions = []
+    for start, end in zip(np.maximum(starts[long_enough] - padding, 0) * frame_length, np.minimum((ends[long_enough] + padding) * frame_length, len(pcm))):
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], int(end))
+        else:
+            regions.append((int(start), int(end)))
+    return regions
+
+def describe_speech_regions(regions, sample_rate, total_samples):
+    """One line saying how much of the audio is speech and how much voice-activity detection skipped."""
+    speech = sum(end - start for start, end in regions) / float(sample_rate)
+    total = total_samples / float(sample_rate)
+    skipped = total - speech
+    return (f"Voice activity: {format_timestamp(speech)} of speech in {format_timestamp(total)}, "
+            f"skipped {format_timestamp(skipped)} ({100.0 * skipped / total if total else 0.0:.0f}%) of silence, music and noise")
+
+def _recognize_segment(recognize, pcm, sample_rate, start, end, cache=None):
+    """Return (text, None) for one segment, or ("", error) if the recognizer raised."""
+    key = cache.key(recognize.cache_key, pcm, sample_rate) if cache is not None else None
+    if key is not None:
+        text = cache.get(key)
+        if text is not None:
+            return text, None
+    try:
+        text = recognize(pcm, sample_rate)
+    except Exception as e:
+        print(f"Failed to transcribe {format_timestamp(start)} - {format_timestamp(end)}: {str(e) or type(e).__name__}")
+        return "", e
+    if key is not None:
+        cache.put(key, text)  # Failed segments are not cached, so a later run retries them
+    return text, None
+
+def transcribe_pcm(pcm, sample_rate, recognize, max_workers=4, max_segment_seconds=30.0, cache=None, regions=None):
+    """Transcribe 16-bit mono PCM in silence-bounded segments on a thread pool.
+
+    recognize(pcm, sample_rate) turns one segment into text: a RecognizerBackend, a BatchRecognizer or
+    any other callable, so a local stand-in can replace a remote API in tests. At most max_workers
+    segments are in flight at once. A segment that fails comes back with empty text and the error
+    message in error instead of failing the whole video, but if every segment fails a RuntimeError
+    is raised. Returns Segments with start and end times in seconds, in order.
+
+    With a TranscriptCache, each segment is looked up by its audio fingerprint under the recognizer's
+    cache_key first, and only the misses are sent to the recognizer. regions, such as those from
+    speech_regions(), limits transcription to those (start_sample, end_sample) spans; the rest of
+    the audio is never sent.
+    """
+    if cache is not None and getattr(recognize, "cache_key", None) is None:
+        raise ValueError("Caching transcripts needs a recognizer with a cache_key, such as a RecognizerBackend")
+    if regions is None:
+        regions = [(0, len(pcm))]
+    boundaries = [(region_start + start, region_start + end) for region_start, region_end in regions
+                  for start, end in split_on_silence(pcm[region_start:region_end], sample_rate, max_segment_seconds)]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcriber") as executor:
+        futures = [executor.submit(_recognize_segment, recognize, pcm[start:end], sample_rate, start / sample_rate, end / sample_rate, cache)
+                   for start, end in boundaries]
+        results = [future.result() for future in futures]
+    errors = [error for text, error in results if error is not None]
+    if errors and len(errors) == len(results):
+        raise RuntimeError(f"All {len(errors)} segments failed to transcribe: {errors[0]}") from errors[0]
+    return [Segment(start / sample_rate, end / sample_rate, text.strip(), None if error is None else str(error) or type(error).__name__)
+            for (start, end), (text, error) in zip(boundaries, results)]
+
+class RecognizerBackend:
+    """Speech-to-text engine for 16-bit mono PCM segments.
+
+    Backends are callable as recognize(pcm, sample_rate), so they plug straight into transcribe_pcm.
+    recognize_batch() handles several segments at once; by default it runs them on max_workers threads,
+    and backends that can do better override it. language is a BCP-47 tag such as "en-US" or "id-ID".
+    """
+
+    name = None
+    max_workers = 4
+
+    def __init__(self, language="en-US"):
+        self.language = language
+
+    @property
+    def cache_key(self):
+        """Names the engine and settings whose transcripts a TranscriptCache may reuse for this backend."""
+        return f"{self.name}-{self.language}"
+
+    def recognize(self, pcm, sample_rate):
+        raise NotImplementedError
+
+    def recognize_batch(self, batch):
+        """Transcribe a list of (pcm, sample_rate) segments, returning a text or the exception raised for each, in order.
+
+        A segment that fails does not fail the others.
+        """
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batch)) or 1) as executor:
+            futures = [executor.submit(self.recognize, *segment) for segment in batch]
+            return [future.exception() or future.result() for future in futures]
+
+    def __call__(self, pcm, sample_rate):
+        return self.recognize(pcm, sample_rate)
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API through SpeechRecognition. Needs an internet connection."""
+
+    name = "google"
+
+    def __init__(self, language="en-US", timeout=None, max_workers=4):
+        if sr is None:
+            raise ImportError("Google transcription needs SpeechRecognition. Install it with: pip install SpeechRecognition")
+        super().__init__(language)
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def recognize(self, pcm, sample_rate):
+        recognizer = sr.Recognizer()
+        recognizer.operation_timeout = self.timeout
+        try:
+            return recognizer.recognize_google(sr.AudioData(pcm.tobytes(), sample_rate, 2), language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+class FasterWhisperBackend(RecognizerBackend):
+    """Offline Whisper on the CPU through faster-whisper (CTranslate2) with int8 weights.
+
+    The model is loaded once with workers inference workers, each using cpu_threads threads, so
+    workers segments are decoded at the same time; recognize_batch keeps them all busy. The default
+    of one worker per two cores with two threads each suits int8 Whisper on most CPUs.
+    """
+
+    name = "faster_whisper"
+
+    def __init__(self, language="en-US", model_size="small", compute_type="int8", workers=None, cpu_threads=2, beam_size=1):
+        if WhisperModel is None:
+            raise ImportError("Offline transcription needs faster-whisper. Install it with: pip install faster-whisper")
+        super().__init__(language)
+        self.max_workers = workers or max(1, (os.cpu_count() or 2) // cpu_threads)
+        self.model_size = model_size
+        self.beam_size = beam_size
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads, num_workers=self.max_workers)
+
+    @property
+    def cache_key(self):
+        return f"{self.name}-{self.model_size}-beam{self.beam_size}-{self.language}"
+
+    def recognize(self, pcm, sample_rate):
+        if sample_rate != 16000:
+            raise ValueError(f"Whisper needs 16 kHz audio, got {sample_rate} Hz")
+        segments, info = self.model.transcribe(pcm.astype(np.float32) / 32768.0, language=self.language.split("-")[0], beam_size=self.beam_size)
+        return " ".join(segment.text.strip() for segment in segments)
+
+class FakeBackend(RecognizerBackend):
+    """Deterministic stand-in for tests: describes each segment by its length and a checksum of its samples."""
+
+    name = "fake"
+
+    def __init__(self, language="en-US", delay=0.0, max_workers=4):
+        super().__init__(language)
+        self.delay = delay
+        self.max_workers = max_workers
+        self.calls = 0
+
+    def recognize(self, pcm, sample_rate):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return f"[{self.language} {len(pcm) / float(sample_rate):.2f}s {zlib.crc32(pcm.tobytes()):08x}]"
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "faster_whisper": FasterWhisperBackend,
+    "fake": FakeBackend,
+}
+
+def get_backend(backend="google", language="en-US", **options):
+    """Create a recognizer backend by name. Extra options go to the backend's constructor."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown recognizer backend '{backend}'. Available backends: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](language=language, **options)
+
+class BatchRecognizer:
+    """Share one backend between several transcriptions and feed it segments in batches.
+
+    Callers block in recognize(pcm, sample_rate) while a single batching thread gathers up to
+    batch_size waiting segments, from any number of videos, for at most max_wait seconds and hands
+    them to backend.recognize_batch together. With several videos transcribed at once, an offline
+    backend stays busy on all its workers instead of idling between one video's segments.
+    """
+
+    def __init__(self, backend, batch_size=None, max_wait=0.05):
+        self.backend = backend
+        self.batch_size = batch_size or backend.max_workers
+        self.max_wait = max_wait
+        self.language = backend.language
+        self.cache_key = backend.cache_key
+        self.max_workers = self.batch_size
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="batch-recognizer", daemon=True)
+        self.thread.start()
+
+    def recognize(self, pcm, sample_rate):
+        future = Future()
+        self.requests.put((pcm, sample_rate, future))
+        return future.result()
+
+    def __call__(self, pcm, sample_rate):
+        return self.recognize(pcm, sample_rate)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    request = self.requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            try:
+                results = self.backend.recognize_batch([(pcm, sample_rate) for pcm, sample_rate, future in batch])
+            except Exception as e:
+                for pcm, sample_rate, future in batch:
+                    future.set_exception(e)
+                continue
+            # Each segment gets its own text or error, so one failed request does not fail the rest of the batch
+            for (pcm, sample_rate, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def close(self):
+        """Finish the queued segments and stop the batching thread."""
+        self.requests.put(None)
+        self.thread.join()
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:04.1f}"
+
+def _segment_failure(segment):
+    return f"[segment {format_timestamp(segment.start)}-{format_timestamp(segment.end)} failed: {segment.error}]"
+
+def segments_text(segments):
+    """Plain transcript: the non-empty segment texts joined in order, with a marker where a segment failed."""
+    return " ".join(_segment_failure(segment) if segment.error else segment.text for segment in segments if segment.text or segment.error)
+
+def segments_timestamped(segments):
+    """One "[start - end] text" line per segment; failed segments show their error instead."""
+    return "\n".join(f"[{format_timestamp(segment.start)} - {format_timestamp(segment.end)}] {f'failed: {segment.error}' if segment.error else segment.text}"
+                     for segment in segments)
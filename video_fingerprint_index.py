@@ -0,0 +1,141 @@
+import cv2
+import json
+import os
+import threading
+import numpy as np
+from scene_detection import downscale_frame, get_video_fps, read_frame_at
+from frame_hash_index import dhash
+
+_BIT_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount(values):
+    """Set bits of each element of a uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _BIT_COUNTS[values[..., None].view(np.uint8)].sum(axis=-1)
+
+def temporal_fingerprint(video_path, count=30, hash_width=64):
+    """Sequence of 64-bit dHashes of count frames spread evenly from the start of a video to its end.
+
+    Frame i is taken at (2i + 1) / (2 * count) of the way through, by seeking, so the beginning,
+    middle and end all count and two videos that only share an intro or a title card do not match.
+    Frames are shrunk before hashing, so the fingerprint is the same for the low-resolution and HD
+    renditions of a video and survives re-encoding. Returns a uint64 array.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        hashes = []
+        for i in range(count if frame_count > 0 else 0):
+            frame = read_frame_at(cap, frame_count * (2 * i + 1) // (2 * count))
+            if frame is not None:
+                hashes.append(dhash(downscale_frame(frame, hash_width)))
+    finally:
+        cap.release()
+    return np.array(hashes, dtype=np.uint64)
+
+def video_duration(video_path):
+    """Length of a video in seconds from its frame count and frame rate, or None if unknown."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        return frame_count / get_video_fps(cap) if frame_count > 0 else None
+    finally:
+        cap.release()
+
+class VideoFingerprintIndex:
+    """Local index of temporal fingerprints for spotting re-uploads and videos listed twice.
+
+    Fingerprints are stored as fixed-length rows of a raw uint64 file, index.bin, with one JSON line
+    per row in index.jsonl for the video ID, path, duration and number of valid hashes. Both files are
+    only appended to. A query compares the probe against every row at once with NumPy, aligning the
+    hash sequences at up to max_shift samples of offset, so tens of thousands of videos take
+    milliseconds. A video matches when its length agrees with the probe's to within duration_tolerance
+    (a fraction, at least 2 seconds) and its aligned hashes differ by at most max_mean_distance bits
+    on average over at least min_overlap positions.
+    """
+
+    def __init__(self, index_dir, length=30, max_mean_distance=8.0, min_overlap=5, max_shift=2, duration_tolerance=0.02):
+        self.index_dir = index_dir
+        self.length = length
+        self.max_mean_distance = max_mean_distance
+        self.min_overlap = min_overlap
+        self.max_shift = max_shift
+        self.duration_tolerance = duration_tolerance
+        self.lock = threading.Lock()
+        self.entries = []
+        self.video_ids = set()
+        self.fingerprints = np.zeros((0, length), dtype=np.uint64)
+        self.valid = np.zeros((0, length), dtype=bool)
+        self.durations = np.zeros(0, dtype=np.float64)
+        os.makedirs(index_dir, exist_ok=True)
+        entries_path = os.path.join(index_dir, "index.jsonl")
+        rows_path = os.path.join(index_dir, "index.bin")
+        if os.path.exists(entries_path) and os.path.exists(rows_path):
+            with open(entries_path, "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            rows = np.fromfile(rows_path, dtype=np.uint64)
+            count = min(len(entries), len(rows) // length)  # Ignore a row cut short by an interrupted write
+            self.entries = entries[:count]
+            self.fingerprints = rows[:count * length].reshape(count, length)
+            self.valid = np.arange(length) < np.array([entry["hashes"] for entry in self.entries], dtype=np.int64)[:, None]
+            self.video_ids = {entry["video_id"] for entry in self.entries}
+            # Entries written before durations were stored have NaN, which never agrees with a probe's duration
+            self.durations = np.array([entry.get("duration") for entry in self.entries], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, video_id):
+        return video_id in self.video_ids
+
+    def _row(self, fingerprint):
+        row = np.zeros(self.length, dtype=np.uint64)
+        fingerprint = np.asarray(fingerprint, dtype=np.uint64)[:self.length]
+        row[:len(fingerprint)] = fingerprint
+        return row, len(fingerprint)
+
+    def find(self, fingerprint, duration=None):
+        """Return (entry, mean_distance) for the closest indexed video that matches, or None.
+
+        duration is the probe video's length in seconds; when given, only videos of about the same
+        length can match.
+        """
+        row, count = self._row(fingerprint)
+        with self.lock:
+            fingerprints, valid, entries, durations = self.fingerprints, self.valid, self.entries, self.durations
+        if not entries or count < self.min_overlap:
+            return None
+        best_distance = np.full(len(entries), np.inf)
+        for shift in range(-self.max_shift, self.max_shift + 1):
+            # Probe position i lines up with stored position i + shift
+            probe = slice(max(0, -shift), min(count, self.length - shift))
+            stored = slice(probe.start + shift, probe.stop + shift)
+            if probe.stop - probe.start < self.min_overlap:
+                continue
+            distances = _popcount(fingerprints[:, stored] ^ row[probe])
+            overlap = valid[:, stored].sum(axis=1)
+            total = np.where(valid[:, stored], distances, 0).sum(axis=1)
+            mean = np.where(overlap >= self.min_overlap, total / np.maximum(overlap, 1), np.inf)
+            best_distance = np.minimum(best_distance, mean)
+        if duration is not None:
+            best_distance[~(np.abs(durations - duration) <= max(2.0, self.duration_tolerance * duration))] = np.inf
+        best = int(np.argmin(best_distance))
+        if best_distance[best] > self.max_mean_distance:
+            return None
+        return entries[best], float(best_distance[best])
+
+    def add(self, video_id, fingerprint, video_path=None, duration=None):
+        """Append a video's fingerprint and its length in seconds to the index."""
+        row, count = self._row(fingerprint)
+        entry = {"video_id": video_id, "path": video_path, "duration": duration, "hashes": count}
+        with self.lock:
+            with open(os.path.join(self.index_dir, "index.bin"), "ab") as f:
+                row.tofile(f)
+            with open(os.path.join(self.index_dir, "index.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.entries = self.entries + [entry]
+            self.video_ids.add(video_id)
+            self.fingerprints = np.vstack([self.fingerprints, row])
+            self.valid = np.vstack([self.valid, np.arange(self.length) < count])
+            self.durations = np.append(self.durations, np.nan if duration is None else duration)
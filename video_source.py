@@ -0,0 +1,177 @@
+import cv2
+import numpy as np
+from functools import partial
+
+try:
+    import av
+except ImportError:
+    av = None
+
+PIXEL_FORMATS = ("bgr24", "gray")
+
+def _output_size(width, height, output_width):
+    """(width, height) of a frame scaled to output_width, keeping the aspect ratio; unchanged when output_width is None."""
+    if output_width is None or output_width >= width:
+        return width, height
+    return output_width, max(1, int(round(height * output_width / float(width))))
+
+class OpenCVSource:
+    """cv2.VideoCapture on the FFmpeg backend with its decoder threads and output format under control.
+
+    threads sets the FFmpeg decoder thread count (0 lets FFmpeg choose) and hw_acceleration asks for
+    any available hardware decoder. OpenCV always decodes to full-size BGR, so pixel_format="gray"
+    and output_width are applied on retrieve(), before the frame is handed out.
+    """
+
+    def __init__(self, video_path, threads=0, pixel_format="bgr24", output_width=None, hw_acceleration=False):
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format '{pixel_format}'. Available formats: {', '.join(PIXEL_FORMATS)}")
+        params = [cv2.CAP_PROP_N_THREADS, threads]
+        if hw_acceleration:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        self.cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, params)
+        self.pixel_format = pixel_format
+        self.size = _output_size(int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), output_width)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def grab(self):
+        return self.cap.grab()
+
+    def retrieve(self):
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return ret, frame
+        if self.size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if self.pixel_format == "gray":
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return True, frame
+
+    def read(self):
+        return self.retrieve() if self.grab() else (False, None)
+
+    def release(self):
+        self.cap.release()
+
+class PyAVSource:
+    """PyAV decoder behind the subset of the cv2.VideoCapture API the scene detectors use.
+
+    threads and thread_type ("AUTO", "FRAME" or "SLICE") configure FFmpeg's decoder threading.
+    Frames are converted by swscale straight from the decoder's YUV output to pixel_format at
+    output_width, so a small gray frame is just a scaled copy of the luma plane and the full-size BGR
+    image is never built. lowres asks codecs that support it (MJPEG, H.263, ...) to decode at 1/2,
+    1/4 or 1/8 size. grab() decodes without converting; set(CAP_PROP_POS_FRAMES) seeks to the
+    previous keyframe and decodes forward. Frame indices assume a constant frame rate.
+    """
+
+    def __init__(self, video_path, threads=0, thread_type="AUTO", pixel_format="bgr24", output_width=None, lowres=0):
+        if av is None:
+            raise ImportError("The PyAV backend needs PyAV. Install it with: pip install av")
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format '{pixel_format}'. Available formats: {', '.join(PIXEL_FORMATS)}")
+        self.container = av.open(video_path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = thread_type
+        self.stream.codec_context.thread_count = threads
+        if lowres:
+            self.stream.codec_context.options = {"lowres": str(lowres)}
+        self.pixel_format = pixel_format
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 0)
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.size = _output_size(self.width, self.height, output_width)
+        self.start_pts = self.stream.start_time or 0
+        self._seek(0)
+
+    def _seek(self, frame_index):
+        """Position the decoder so the next grab() returns frame_index."""
+        if frame_index > 0:
+            self.container.seek(self.start_pts + int(frame_index / self.fps / self.stream.time_base), stream=self.stream, backward=True)
+        elif hasattr(self, "frames"):
+            self.container.seek(self.start_pts, stream=self.stream, backward=True)
+        self.frames = self.container.decode(self.stream)
+        self.current = None
+        self.pending = None
+        self.position = frame_index
+        if frame_index > 0:
+            for frame in self.frames:
+                if frame.pts is None or self._frame_index(frame) >= frame_index:
+                    self.pending = frame
+                    break
+
+    def _frame_index(self, frame):
+        return int(round(float((frame.pts - self.start_pts) * self.stream.time_base) * self.fps))
+
+    def isOpened(self):
+        return self.container is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self.stream.frames:
+                return float(self.stream.frames)
+            if self.stream.duration:
+                return float(self.stream.duration * self.stream.time_base) * self.fps
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self._seek(max(0, int(value)))
+        return True
+
+    def grab(self):
+        if self.pending is not None:
+            self.current, self.pending = self.pending, None
+        else:
+            self.current = next(self.frames, None)
+        if self.current is None:
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        if self.current is None:
+            return False, None
+        width, height = self.size
+        frame = self.current.to_ndarray(format=self.pixel_format, width=width, height=height)
+        return True, np.ascontiguousarray(frame)
+
+    def read(self):
+        return self.retrieve() if self.grab() else (False, None)
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+BACKENDS = {
+    "opencv": OpenCVSource,
+    "pyav": PyAVSource,
+}
+
+def open_video_source(video_path, backend="opencv", **options):
+    """Open a video with the named decode backend. Extra options go to the backend's constructor."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown video backend '{backend}'. Available backends: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](video_path, **options)
+
+def video_source_factory(backend="opencv", **options):
+    """Picklable open_source(video_path) callable for detectors that open the video in worker processes."""
+    return partial(open_video_source, backend=backend, **options)